@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: scalar haversine loop vs. batch NumPy distances
+Usage: python benchmarks/bench_distances.py [--radius 50] [--k 20]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from distances import haversine_distance, nearest  # noqa: E402
+
+ORIGIN = (48.8566, 2.3522)  # Paris
+
+
+def scalar_loop(lats, lons, radius_km, k):
+    """What get_listings used to do: one call per listing, then a full sort"""
+    matches = []
+    for i in range(len(lats)):
+        distance = haversine_distance(ORIGIN[0], ORIGIN[1], lats[i], lons[i])
+        if distance <= radius_km:
+            matches.append((distance, i))
+    matches.sort()
+    return [i for _, i in matches[:k]]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--radius", type=float, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'listings':>10} {'scalar (ms)':>12} {'numpy (ms)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        # Metropolitan France bounding box
+        lats = rng.uniform(42.3, 51.1, size)
+        lons = rng.uniform(-4.8, 8.2, size)
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+
+        repeat = 1 if size >= 1_000_000 else 3
+        scalar_time, expected = best_of(lambda: scalar_loop(lat_list, lon_list, args.radius, args.k), repeat)
+        numpy_time, (indices, _) = best_of(
+            lambda: nearest(ORIGIN[0], ORIGIN[1], lats, lons, radius_km=args.radius, k=args.k), repeat * 3
+        )
+        assert indices.tolist() == expected, "batch result differs from the scalar loop"
+        print(f"{size:>10} {scalar_time * 1000:>12.1f} {numpy_time * 1000:>11.1f} {scalar_time / numpy_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
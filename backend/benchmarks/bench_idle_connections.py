@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark: idle WebSocket connections held by the real-time hub
+Starts worker processes serving realtime.websocket_session (JWT auth left out),
+opens idle connections spread over the workers and reports the memory each
+worker pays per connection, then publishes one event per user from worker 0
+and measures how long it takes to reach every connection. With --workers > 1
+the workers share events through the run_broker() relay.
+Usage: python benchmarks/bench_idle_connections.py [--connections 10000] [--workers 1] [--ws wsproto]
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from realtime import Hub, backend_from_url, run_broker, websocket_session  # noqa: E402
+
+BASE_PORT = 8790
+BROKER_PORT = 7790
+
+
+def raise_fd_limit():
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def rss_mb(pid: int) -> float:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def serve(port: int, broker_url: str, ws_impl: str):
+    """One worker: the hub, /ws and a /publish trigger"""
+    import uvicorn
+    from fastapi import FastAPI, WebSocket
+
+    app = FastAPI()
+    hub = Hub(backend=backend_from_url(broker_url))
+
+    @app.on_event("startup")
+    async def start():
+        await hub.start()
+
+    @app.websocket("/ws")
+    async def session(websocket: WebSocket, user: str):
+        await websocket.accept()
+        await websocket_session(websocket, hub, user)
+
+    @app.post("/publish")
+    async def publish(users: int):
+        for user in range(users):
+            await hub.publish(f"u{user}", {"type": "message", "sent_at": time.time()})
+        return hub.stats()
+
+    uvicorn.run(app, port=port, log_level="warning", ws=ws_impl, ws_ping_interval=None, backlog=4096)
+
+
+async def wait_for_port(port: int):
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+async def run(args):
+    import websockets
+
+    broker_url = f"tcp://127.0.0.1:{BROKER_PORT}" if args.workers > 1 else ""
+    processes = []
+    if broker_url:
+        processes.append(subprocess.Popen([sys.executable, __file__, "--serve-broker"]))
+        await wait_for_port(BROKER_PORT)
+    workers = []
+    for i in range(args.workers):
+        port = BASE_PORT + i
+        worker = subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--broker", broker_url,
+                                   "--ws", args.ws])
+        processes.append(worker)
+        workers.append((worker, port))
+    try:
+        for _, port in workers:
+            await wait_for_port(port)
+        await asyncio.sleep(1)
+        before = [rss_mb(worker.pid) for worker, _ in workers]
+
+        # Connections are spread over the workers; users have connections/users tabs each
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(500)
+
+        async def connect(i):
+            port = workers[i % len(workers)][1]
+            async with semaphore:
+                return await websockets.connect(
+                    f"ws://127.0.0.1:{port}/ws?user=u{i % args.users}", ping_interval=None, open_timeout=60
+                )
+
+        sockets = await asyncio.gather(*(connect(i) for i in range(args.connections)))
+        opened = time.perf_counter() - start
+        await asyncio.sleep(2)
+        after = [rss_mb(worker.pid) for worker, _ in workers]
+
+        print(f"{args.connections} idle connections over {args.workers} {args.ws} worker(s), opened in {opened:.1f}s")
+        print(f"{'worker':>6} {'connections':>12} {'RSS before (MB)':>16} {'RSS after (MB)':>15} {'KB/conn':>8}")
+        for i, (b, a) in enumerate(zip(before, after)):
+            held = len(range(i, args.connections, len(workers)))
+            print(f"{i:>6} {held:>12} {b:>16.1f} {a:>15.1f} {(a - b) * 1024 / held:>8.1f}")
+
+        # Fan-out: one event per user, published on worker 0
+        async def receive(socket):
+            event = json.loads(await socket.recv())
+            return time.time() - event["sent_at"]
+
+        receivers = [asyncio.create_task(receive(socket)) for socket in sockets]
+        reader, writer = await asyncio.open_connection("127.0.0.1", workers[0][1])
+        writer.write(f"POST /publish?users={args.users} HTTP/1.1\r\nHost: x\r\nContent-Length: 0\r\n\r\n".encode())
+        await writer.drain()
+        latencies = np.array(await asyncio.gather(*receivers)) * 1000
+        writer.close()
+        print(f"fan-out of {args.users} event(s) to {len(latencies)} connections: "
+              f"p50 {np.percentile(latencies, 50):.0f} ms, p99 {np.percentile(latencies, 99):.0f} ms, "
+              f"max {latencies.max():.0f} ms")
+
+        await asyncio.gather(*(socket.close() for socket in sockets))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--ws", choices=["websockets", "wsproto"], default="wsproto",
+                        help="uvicorn WebSocket implementation")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--serve-broker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--broker", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    if args.serve_broker:
+        asyncio.run(run_broker(port=BROKER_PORT))
+    elif args.serve:
+        serve(args.serve, args.broker, args.ws)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
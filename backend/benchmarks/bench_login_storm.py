@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-loop latency during a login storm
+Compares bcrypt verification inline in the coroutine (the old login handler)
+with the bounded PasswordHasher thread pool.
+Usage: python benchmarks/bench_login_storm.py [--logins 40] [--rounds 12]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from passwords import PasswordHasher, PasswordHasherBusy  # noqa: E402
+
+TICK = 0.005
+
+
+async def measure_lag(stop: asyncio.Event, lags: list):
+    """How late a 5 ms sleep wakes up: what every other request waits for"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def storm(hasher: PasswordHasher, hashed: str, logins: int, inline: bool):
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(TICK * 2)
+
+    async def login():
+        if inline:
+            return hasher.context.verify("secret", hashed)
+        try:
+            return (await hasher.verify_and_update("secret", hashed))[0]
+        except PasswordHasherBusy:
+            return None
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    rejected = sum(r is None for r in results)
+    return elapsed, np.percentile(lags, 99), max(lags), rejected
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(rounds=args.rounds, workers=args.workers, max_pending=args.max_pending)
+    hashed = await hasher.hash("secret")
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {args.workers} worker(s)")
+    print(f"{'mode':>10} {'total (s)':>10} {'loop lag p99 (ms)':>18} {'max (ms)':>9} {'503':>5}")
+    for mode, inline in (("inline", True), ("executor", False)):
+        elapsed, p99, worst, rejected = await storm(hasher, hashed, args.logins, inline)
+        print(f"{mode:>10} {elapsed:>10.2f} {p99:>18.1f} {worst:>9.1f} {rejected:>5}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
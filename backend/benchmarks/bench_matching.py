@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized top-k matching vs. the calculate_match_score loop
+Usage: python benchmarks/bench_matching.py [--listings 100000] [--queries 500]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from matching import MatchSnapshot, calculate_match_score  # noqa: E402
+
+CITIES = ["Paris", "Lyon", "Marseille", "Toulouse", "Nice", "Nantes", "Bordeaux", "Lille", "Rennes", "Reims"]
+PROFESSIONS = ["Médecin généraliste", "Kinésithérapeute", "Infirmier", "Dentiste", "Orthophoniste",
+               "Psychologue", "Sage-femme", "Ostéopathe", "Podologue", "Diététicien"]
+STRUCTURES = ["MSP", "Cabinet"]
+
+
+def make_listing(rng, i):
+    return {
+        "id": str(i),
+        "city": rng.choice(CITIES),
+        "structure_type": rng.choice(STRUCTURES),
+        "size": rng.randint(10, 200),
+        "monthly_rent": rng.randint(200, 3000),
+        "profiles_searched": rng.sample(PROFESSIONS, rng.randint(0, 3)),
+    }
+
+
+def make_user(rng):
+    return {
+        "preferred_city": rng.choice(CITIES + [None]),
+        "max_budget": rng.choice([None, rng.randint(300, 3000)]),
+        "min_size": rng.choice([None, rng.randint(10, 150)]),
+        "preferred_structure_type": rng.choice(STRUCTURES + [None]),
+        "profession": rng.choice(PROFESSIONS),
+    }
+
+
+def scalar_top(user, listings, limit):
+    """What /matches/top used to do: score everything, sort everything"""
+    matches = []
+    for i, listing in enumerate(listings):
+        score, _ = calculate_match_score(user, listing)
+        if score > 0:
+            matches.append((score, i))
+    matches.sort(key=lambda m: m[0], reverse=True)
+    return [(i, score) for score, i in matches[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    listings = [make_listing(rng, i) for i in range(args.listings)]
+    users = [make_user(rng) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    snapshot = MatchSnapshot(listings)
+    print(f"snapshot of {len(snapshot)} listings built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Same results as the scalar loop
+    for user in users[:5]:
+        assert snapshot.top(user, args.limit) == scalar_top(user, listings, args.limit)
+
+    timings = []
+    for user in users:
+        start = time.perf_counter()
+        snapshot.top(user, args.limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    scalar_top(users[0], listings, args.limit)
+    scalar_ms = (time.perf_counter() - start) * 1000
+
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"vectorized top-{args.limit}: p50 {p50:.2f} ms, p99 {p99:.2f} ms ({args.queries} queries)")
+    print(f"scalar loop: {scalar_ms:.0f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: matching a written listing against every active alert
+Compares evaluating each alert in turn with the AlertIndex reverse index,
+and checks that both return the same alerts.
+Usage: python benchmarks/bench_percolator.py [--alerts 100000] [--listings 2000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gazetteer import Gazetteer, normalize_city  # noqa: E402
+from percolator import AlertIndex, CompiledAlert  # noqa: E402
+
+STRUCTURES = ["MSP", "Cabinet de groupe", "Cabinet individuel", "Centre de santé"]
+PROFESSIONS = ["Médecin généraliste", "Kinésithérapeute", "Infirmier", "Dentiste", "Orthophoniste"]
+
+
+def random_alert(i: int, cities: list) -> dict:
+    return {
+        "id": f"a{i}",
+        "user_id": f"u{i}",
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "active": True,
+        "city": random.choice(cities) if random.random() < 0.9 else None,
+        "radius": random.choice([None, None, 10, 30, 50]),
+        "structure_type": random.choice(STRUCTURES + [None]),
+        "profession": random.choice(PROFESSIONS + [None, None]),
+        "max_rent": random.choice([None, 800, 1200, 2000, 3000]),
+        "min_size": random.choice([None, 15, 25, 40]),
+    }
+
+
+def random_listing(i: int, cities: list, geocode) -> dict:
+    city = random.choice(cities)
+    lat, lon = geocode(city)
+    return {
+        "id": f"l{i}",
+        "city": city,
+        "city_key": normalize_city(city),
+        "location": {"type": "Point", "coordinates": [lon, lat]},
+        "structure_type": random.choice(STRUCTURES),
+        "profiles_searched": random.sample(PROFESSIONS, 2),
+        "monthly_rent": random.randint(300, 3500),
+        "size": random.randint(10, 80),
+    }
+
+
+def compile_alerts(alerts: list, geocode) -> list:
+    return [
+        (alert, CompiledAlert(alert, geocode(alert["city"]) if alert["city"] and alert["radius"] else None))
+        for alert in alerts
+    ]
+
+
+def brute_force(compiled_alerts: list, listing: dict) -> set:
+    """Each alert evaluated on its own, as get_alert_matches used to"""
+    location = listing["location"]["coordinates"]
+    coordinates = (location[1], location[0])
+    matched = set()
+    for alert, compiled in compiled_alerts:
+        if not compiled.center and alert["city"]:
+            key = normalize_city(alert["city"])
+            if listing["city_key"] != key and not listing["city_key"].startswith(key + " "):
+                continue
+        if alert["structure_type"] and alert["structure_type"] != listing["structure_type"]:
+            continue
+        if alert["max_rent"] and listing["monthly_rent"] > alert["max_rent"]:
+            continue
+        if compiled.accepts(listing, coordinates):
+            matched.add(alert["id"])
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--alerts", type=int, default=100000)
+    parser.add_argument("--listings", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    gazetteer = Gazetteer(Path(__file__).resolve().parent.parent / "data" / "communes.bin")
+
+    def geocode(city):
+        index = gazetteer.lookup(city)
+        return gazetteer.coordinates(index) if index is not None else None
+
+    cities = [gazetteer.name(i) for i in range(len(gazetteer))]
+    alerts = [random_alert(i, cities) for i in range(args.alerts)]
+    listings = [random_listing(i, cities, geocode) for i in range(args.listings)]
+
+    start = time.perf_counter()
+    index = AlertIndex(geocode)
+    for alert in alerts:
+        index.add(alert)
+    build = time.perf_counter() - start
+
+    compiled_alerts = compile_alerts(alerts, geocode)
+    sample = listings[:max(1, args.listings // 20)]
+    start = time.perf_counter()
+    expected = [brute_force(compiled_alerts, listing) for listing in sample]
+    scan = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    found = [{alert.id for alert in index.match(listing)} for listing in listings]
+    indexed = (time.perf_counter() - start) / len(listings)
+
+    assert found[:len(sample)] == expected, "index and brute force disagree"
+    hits = sum(len(f) for f in found) / len(found)
+    print(f"{args.alerts} alerts, index built in {build:.2f}s, {hits:.0f} matching alerts per listing on average")
+    print(f"{'method':>12} {'per listing (ms)':>17}")
+    print(f"{'each alert':>12} {scan * 1000:>17.2f}")
+    print(f"{'index':>12} {indexed * 1000:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Build the commune gazetteer (data/communes.bin) from a CSV export
+
+Accepted sources:
+- data.gouv.fr "communes-departement-region.csv"
+  (code_commune_INSEE, nom_commune_complet, code_postal, latitude, longitude)
+- La Poste "Base officielle des codes postaux"
+  (Code_commune_INSEE;Nom_de_la_commune;Code_postal;...;coordonnees_gps)
+
+Rows are grouped by INSEE code, so a commune with several postal codes is
+stored once. An optional "population" column orders homonyms.
+
+The repository ships a gazetteer built from data/communes_seed.csv (the
+main cities only); production needs the full export (~35k communes):
+    python build_gazetteer.py --download
+
+Usage: python build_gazetteer.py [SOURCE.csv | --download [URL]] [-o data/communes.bin]
+"""
+
+import argparse
+import csv
+import shutil
+import tempfile
+import urllib.request
+from pathlib import Path
+
+from gazetteer import Gazetteer, write_gazetteer
+
+ROOT_DIR = Path(__file__).parent
+# data.gouv.fr "Communes de France - Base des codes postaux", communes-departement-region.csv
+DATA_GOUV_URL = "https://www.data.gouv.fr/fr/datasets/r/dbe8a621-a9c4-4bc3-9cae-be1699c5ff25"
+
+COLUMNS = {
+    "insee": ("code_commune_insee",),
+    "name": ("nom_commune_complet", "nom_de_la_commune", "nom_commune", "nom"),
+    "postal_code": ("code_postal",),
+    "latitude": ("latitude",),
+    "longitude": ("longitude",),
+    "gps": ("coordonnees_gps", "coordonnees_geographiques"),
+    "population": ("population",),
+}
+
+
+# The exports list Paris, Lyon and Marseille by municipal arrondissement
+# ("Paris 01", INSEE 751xx): they are folded into their commune so that
+# "Paris" resolves, and "Paris 15e" or "75015" resolve to it too.
+ARRONDISSEMENTS = {
+    "75056": ("Paris", range(75101, 75121)),
+    "69123": ("Lyon", range(69381, 69390)),
+    "13055": ("Marseille", range(13201, 13217)),
+}
+PARENT_COMMUNE = {
+    str(code): (insee, name) for insee, (name, codes) in ARRONDISSEMENTS.items() for code in codes
+}
+
+
+def find_column(fieldnames, key):
+    normalized = {name.lstrip("#").strip().lower(): name for name in fieldnames}
+    for candidate in COLUMNS[key]:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def read_communes(source: Path):
+    with open(source, encoding="utf-8-sig", newline="") as f:
+        dialect = csv.Sniffer().sniff(f.read(4096), delimiters=",;")
+        f.seek(0)
+        reader = csv.DictReader(f, dialect=dialect)
+        columns = {key: find_column(reader.fieldnames, key) for key in COLUMNS}
+        if not columns["name"] or not columns["postal_code"]:
+            raise SystemExit(f"{source}: missing commune name or postal code column")
+
+        communes = {}
+        for row in reader:
+            if columns["latitude"] and row.get(columns["latitude"]):
+                lat, lon = float(row[columns["latitude"]]), float(row[columns["longitude"]])
+            elif columns["gps"] and row.get(columns["gps"]):
+                lat, lon = (float(v) for v in row[columns["gps"]].split(","))
+            else:
+                continue
+            name = row[columns["name"]].strip()
+            source_key = row[columns["insee"]].strip() if columns["insee"] else name
+            key, name = PARENT_COMMUNE.get(source_key, (source_key, name))
+            population = int(float(row[columns["population"]] or 0)) if columns["population"] else 0
+            commune = communes.setdefault(key, {"name": name, "sources": {}, "postal_codes": set()})
+            # One entry per source commune (arrondissement), whatever its number of postal codes
+            commune["sources"].setdefault(source_key, (lat, lon, population))
+            commune["postal_codes"].add(row[columns["postal_code"]].strip().zfill(5))
+
+    for commune in communes.values():
+        sources = list(commune["sources"].values())
+        # A folded commune sits at the mean of its arrondissements
+        commune["lat"] = sum(lat for lat, _, _ in sources) / len(sources)
+        commune["lon"] = sum(lon for _, lon, _ in sources) / len(sources)
+        commune["population"] = sum(population for _, _, population in sources)
+
+    # Most populated first so that homonyms resolve to the largest commune
+    ordered = sorted(communes.values(), key=lambda c: -c["population"])
+    return [(c["name"], c["lat"], c["lon"], sorted(c["postal_codes"])) for c in ordered]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the commune gazetteer")
+    parser.add_argument("source", nargs="?", type=Path, default=ROOT_DIR / "data" / "communes_seed.csv")
+    parser.add_argument("--download", nargs="?", const=DATA_GOUV_URL, metavar="URL",
+                        help="download the CSV export first (default: data.gouv.fr)")
+    parser.add_argument("-o", "--output", type=Path, default=ROOT_DIR / "data" / "communes.bin")
+    args = parser.parse_args()
+
+    if args.download:
+        with tempfile.NamedTemporaryFile(suffix=".csv") as f:
+            with urllib.request.urlopen(args.download, timeout=60) as response:
+                shutil.copyfileobj(response, f)
+            f.flush()
+            communes = read_communes(Path(f.name))
+    else:
+        communes = read_communes(args.source)
+    write_gazetteer(args.output, communes)
+    size = args.output.stat().st_size
+    print(f"{len(Gazetteer(args.output))} communes written to {args.output} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
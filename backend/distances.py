@@ -0,0 +1,67 @@
+"""
+Batch great-circle distances
+
+One origin against arrays of coordinates (listings, alert centers), in a single
+NumPy pass instead of calling haversine_distance once per listing.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate the great circle distance between two points on earth (in km)"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Distances (km) from (lat, lon) to every point of the lats/lons arrays"""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    delta_lat = lat2 - lat1
+    delta_lon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(delta_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest(
+    lat: float,
+    lon: float,
+    lats,
+    lons,
+    radius_km=None,
+    k: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of the points closest to (lat, lon), sorted by distance
+    Points further than radius_km (one radius, or one per point) are dropped
+    and at most k are returned.
+    NaN coordinates (unknown location) never match.
+    Returns: (indices, distances in km)
+    """
+    distances = haversine_km(lat, lon, lats, lons)
+    if radius_km is not None:
+        candidates = np.flatnonzero(distances <= radius_km)
+    else:
+        candidates = np.flatnonzero(~np.isnan(distances))
+
+    if k is not None and k < len(candidates):
+        if k <= 0:
+            return candidates[:0], distances[:0]
+        # Partial selection of the k nearest, then sort only those
+        candidates = candidates[np.argpartition(distances[candidates], k - 1)[:k]]
+    order = candidates[np.argsort(distances[candidates], kind="stable")]
+    return order, distances[order]
@@ -0,0 +1,147 @@
+"""
+Cacheable file responses
+
+serve_file() answers a GET for a file on disk with what FileResponse leaves
+out:
+- a strong ETag (the content digest when the caller knows it, else derived
+  from mtime and size) and Last-Modified on every response
+- 304 Not Modified when If-None-Match / If-Modified-Since match
+- a single byte range (206, or 416 when unsatisfiable), honouring If-Range,
+  so PDF viewers can fetch the pages of large documents on demand
+Multiple ranges and other units are answered with the whole file, as HTTP
+allows.
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+# For files whose URL changes whenever their content does
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def stat_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # Takes precedence over If-Modified-Since
+        tags = {_opaque_tag(tag) for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single "bytes=" range, or None to send the whole file"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    if not separator or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if not last:
+            return None
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(int(last) if last else size - 1, size - 1)
+
+
+class FileRangeResponse(FileResponse):
+    """206 response with bytes first..last of the file"""
+
+    def __init__(self, path: Path, first: int, last: int, stat_result: os.stat_result, **kwargs):
+        self.first = first
+        self.last = last
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["content-range"] = f"bytes {first}-{last}/{stat_result.st_size}"
+        headers["content-length"] = str(last - first + 1)
+        super().__init__(path, status_code=206, headers=headers, stat_result=stat_result, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.last - self.first + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.first)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File truncated since stat: end the body anyway
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def serve_file(request: Request, path: Path, media_type: str, etag: Optional[str] = None,
+               cache_control: str = "no-cache", filename: Optional[str] = None,
+               headers: Optional[Dict[str, str]] = None) -> Response:
+    """Full, partial (Range) or 304 response for a file; etag defaults to stat_etag()"""
+    stat_result = os.stat(path)
+    etag = etag or stat_etag(stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    validators = {
+        **(headers or {}),
+        "etag": etag,
+        "last-modified": last_modified,
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+
+    if is_not_modified(request.headers, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=validators)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: the client's partial copy is stale, send the whole file instead
+    if range_header and (if_range is None or if_range.strip() in (etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416, headers={**validators, "content-range": f"bytes */{stat_result.st_size}"}
+            )
+        if byte_range is not None:
+            return FileRangeResponse(
+                path, *byte_range, stat_result, headers=validators, media_type=media_type, filename=filename
+            )
+
+    return FileResponse(
+        path, headers=validators, media_type=media_type, filename=filename, stat_result=stat_result
+    )
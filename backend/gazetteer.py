@@ -0,0 +1,160 @@
+"""
+Offline French commune gazetteer
+
+Communes are stored in a compact binary file (built by build_gazetteer.py)
+that is memory-mapped once at startup. Lookups are a binary search over
+sorted name hashes or postal codes, so no per-request scan is needed.
+
+File layout (little endian, every array aligned on 8 bytes):
+    header          magic, version, commune count, postal code count, pool size
+    name_hash       uint64[n]   sorted hashes of normalized commune names
+    name_commune    uint32[n]   commune index for each sorted hash
+    lat, lon        float32[n]  coordinates by commune index
+    name_offset     uint32[n+1] offsets of the display names in the pool
+    postal_code     uint32[m]   sorted postal codes
+    postal_commune  uint32[m]   commune index for each postal code
+    pool            bytes       UTF-8 display names
+"""
+
+import hashlib
+import mmap
+import re
+import struct
+import unicodedata
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"CLGZ"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+
+_POSTAL_CODE_RE = re.compile(r"\b(\d{5})\b")
+_SEPARATORS_RE = re.compile(r"[-'’`.,/()]+")
+_TOKEN_ALIASES = {"saint": "st", "sainte": "ste"}
+
+
+def normalize_city(name: str) -> str:
+    """Normalize a city name: lowercase, no accents, no hyphens, saint/st unified"""
+    if not name:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    ascii_name = "".join(c for c in decomposed if not unicodedata.combining(c))
+    tokens = _SEPARATORS_RE.sub(" ", ascii_name).split()
+    return " ".join(_TOKEN_ALIASES.get(token, token) for token in tokens)
+
+
+def name_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_gazetteer(path: Path, communes: Iterable[Tuple[str, float, float, List[str]]]):
+    """Write communes given as (display name, latitude, longitude, postal codes)"""
+    communes = list(communes)
+    pool = bytearray()
+    name_offset = [0]
+    lat, lon, hashes, postal = [], [], [], []
+    for index, (name, latitude, longitude, postal_codes) in enumerate(communes):
+        pool += name.encode("utf-8")
+        name_offset.append(len(pool))
+        lat.append(latitude)
+        lon.append(longitude)
+        hashes.append((name_hash(normalize_city(name)), index))
+        postal.extend((int(code), index) for code in postal_codes if code.isdigit())
+
+    hashes.sort()
+    postal = sorted(set(postal))
+    arrays = [
+        np.array([h for h, _ in hashes], dtype="<u8"),
+        np.array([i for _, i in hashes], dtype="<u4"),
+        np.array(lat, dtype="<f4"),
+        np.array(lon, dtype="<f4"),
+        np.array(name_offset, dtype="<u4"),
+        np.array([code for code, _ in postal], dtype="<u4"),
+        np.array([i for _, i in postal], dtype="<u4"),
+    ]
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(communes), len(postal), len(pool)))
+        for array in arrays:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(array.tobytes())
+        f.write(bytes(pool))
+
+
+class Gazetteer:
+    """Read-only, memory-mapped view over a gazetteer file"""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, n, m, pool_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a gazetteer file (version {VERSION})")
+
+        offset = HEADER.size
+        arrays = []
+        for dtype, count in (("<u8", n), ("<u4", n), ("<f4", n), ("<f4", n),
+                             ("<u4", n + 1), ("<u4", m), ("<u4", m)):
+            offset = _align(offset)
+            arrays.append(np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset))
+            offset += arrays[-1].nbytes
+        (self._name_hash, self._name_commune, self._lat, self._lon,
+         self._name_offset, self._postal_code, self._postal_commune) = arrays
+        self._pool_offset = offset
+        self._pool_size = pool_size
+
+    def __len__(self) -> int:
+        return len(self._lat)
+
+    def name(self, index: int) -> str:
+        start = self._pool_offset + int(self._name_offset[index])
+        end = self._pool_offset + int(self._name_offset[index + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def coordinates(self, index: int) -> Tuple[float, float]:
+        return float(self._lat[index]), float(self._lon[index])
+
+    def find_by_name(self, name: str) -> Optional[int]:
+        """Commune index for an exact normalized name, or None"""
+        key = normalize_city(name)
+        if not key:
+            return None
+        h = np.uint64(name_hash(key))
+        position = int(np.searchsorted(self._name_hash, h))
+        # Homonyms share a hash; the builder orders them by population
+        while position < len(self._name_hash) and self._name_hash[position] == h:
+            index = int(self._name_commune[position])
+            if normalize_city(self.name(index)) == key:
+                return index
+            position += 1
+        return None
+
+    def find_by_postal_code(self, postal_code: str) -> Optional[int]:
+        code = np.uint32(int(postal_code))
+        position = int(np.searchsorted(self._postal_code, code))
+        if position < len(self._postal_code) and self._postal_code[position] == code:
+            return int(self._postal_commune[position])
+        return None
+
+    def lookup(self, query: str) -> Optional[int]:
+        """Resolve free text such as "Saint-Étienne", "75011" or "Lyon 3e" to a commune"""
+        if not query:
+            return None
+        postal_code = _POSTAL_CODE_RE.search(query)
+        if postal_code:
+            index = self.find_by_postal_code(postal_code.group(1))
+            if index is not None:
+                return index
+        tokens = normalize_city(_POSTAL_CODE_RE.sub(" ", query)).split()
+        # Longest leading token sequence that is a commune ("paris 15e" -> "paris")
+        for length in range(len(tokens), 0, -1):
+            index = self.find_by_name(" ".join(tokens[:length]))
+            if index is not None:
+                return index
+        return None
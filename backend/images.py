@@ -0,0 +1,117 @@
+"""
+Resized variants of listing photos
+
+Every uploaded photo gets smaller copies stored next to it, named
+<photo id>.<variant>.<webp|jpg>. Search results and map popups then download
+a thumbnail instead of the (up to 5 MB) original.
+Resizing is CPU-bound and holds the GIL, so ImagePipeline runs it in a
+separate process pool; uploads return without waiting for it.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Variant -> longest side in pixels, smallest first
+VARIANTS = {"thumb": 320, "card": 800, "full": 1600}
+FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+QUALITY = 82
+# Reject decompression bombs rather than resizing them
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+
+def variant_path(original: Path, variant: str, fmt: str) -> Path:
+    return original.with_name(f"{original.stem}.{variant}.{fmt}")
+
+
+def is_variant(path: Path) -> bool:
+    return len(path.name.split(".")) == 3
+
+
+def best_variant(original: Path, size: str, accept_webp: bool) -> Optional[Path]:
+    """The requested variant, or the next larger one already generated"""
+    names = list(VARIANTS)
+    fmt = "webp" if accept_webp else "jpg"
+    for variant in names[names.index(size):]:
+        path = variant_path(original, variant, fmt)
+        if path.exists():
+            return path
+    return None
+
+
+def make_variants(original: str) -> List[str]:
+    """Write every variant of one photo (runs in a worker process); returns the paths written"""
+    source = Path(original)
+    written = []
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            transparent = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if transparent else "RGB")
+        for variant, side in VARIANTS.items():
+            resized = image.copy()
+            # Never upscales: small photos keep their size
+            resized.thumbnail((side, side), Image.LANCZOS)
+            for fmt, pil_format in FORMATS.items():
+                target = variant_path(source, variant, fmt)
+                temp = target.with_name(f".{target.name}.tmp")
+                out = resized
+                if pil_format == "JPEG" and resized.mode == "RGBA":
+                    # JPEG has no alpha: flatten on white
+                    out = Image.new("RGB", resized.size, (255, 255, 255))
+                    out.paste(resized, mask=resized.getchannel("A"))
+                out.save(temp, pil_format, quality=QUALITY, optimize=pil_format == "JPEG")
+                os.replace(temp, target)
+                written.append(str(target))
+    return written
+
+
+class ImagePipeline:
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._executor = self._new_executor()
+        self._tasks = set()
+        self.metrics = {"generated": 0, "failed": 0}
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: workers must not inherit the server's event loop and sockets
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def generate(self, original: Path) -> List[str]:
+        executor = self._executor
+        try:
+            written = await asyncio.get_running_loop().run_in_executor(executor, make_variants, str(original))
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): replace the pool for the next photos
+            if self._executor is executor:
+                self._executor = self._new_executor()
+            self.metrics["failed"] += 1
+            logger.exception("Could not generate variants of %s", original.name)
+            return []
+        except Exception:
+            self.metrics["failed"] += 1
+            logger.exception("Could not generate variants of %s", original.name)
+            return []
+        self.metrics["generated"] += 1
+        return written
+
+    def submit(self, original: Path):
+        """Generate the variants in the background"""
+        task = asyncio.create_task(self.generate(original))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {**self.metrics, "pending": len(self._tasks)}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
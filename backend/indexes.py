@@ -0,0 +1,253 @@
+"""
+Index registry and query-plan verification
+
+INDEXES declares every index the API relies on; ensure_indexes() applies it
+at startup. CANONICAL_QUERIES lists the query each route runs, so that
+find_collscans() can explain() them against a seeded database and report any
+route that would scan a whole collection.
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+def unique(*keys) -> IndexModel:
+    return IndexModel(list(keys), unique=True)
+
+
+def index(*keys) -> IndexModel:
+    return IndexModel(list(keys))
+
+
+def _asc(field):
+    return (field, ASCENDING)
+
+
+def _desc(field):
+    return (field, DESCENDING)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        unique(_asc("id")),
+        unique(_asc("email")),
+        index(_asc("verification_status"), _desc("created_at")),
+        index(_desc("created_at")),
+    ],
+    "listings": [
+        unique(_asc("id")),
+        index(_asc("owner_id")),
+        index(_desc("created_at"), _desc("id")),
+        index(_asc("city_key"), _desc("created_at"), _desc("id")),
+        index(("location", GEOSPHERE)),
+        # Keyword search: French stemming, diacritic-insensitive (text index v3)
+        IndexModel(
+            [("title", TEXT), ("description", TEXT)],
+            weights={"title": 3, "description": 1},
+            default_language="french",
+            language_override="text_language",
+            name="listings_text"
+        ),
+    ],
+    "listing_views": [
+        unique(_asc("id")),
+        index(_asc("listing_id"), _asc("timestamp")),
+    ],
+    "listing_views_daily": [
+        unique(_asc("listing_id"), _asc("day")),
+    ],
+    "listing_counters": [
+        unique(_asc("listing_id")),
+    ],
+    "favorites": [
+        unique(_asc("id")),
+        unique(_asc("user_id"), _asc("listing_id")),
+        index(_asc("listing_id")),
+    ],
+    "alerts": [
+        unique(_asc("id")),
+        index(_asc("user_id"), _desc("created_at")),
+        index(_asc("city_key")),
+        index(_asc("active"), _asc("id")),
+    ],
+    "alert_hits": [
+        unique(_asc("alert_id"), _asc("listing_id")),
+        index(_asc("alert_id"), _desc("listing_created_at"), _desc("listing_id")),
+        index(_asc("listing_id")),
+    ],
+    "visits": [
+        unique(_asc("id")),
+        index(_asc("practitioner_id"), _asc("date")),
+        index(_asc("owner_id"), _asc("date")),
+        index(_asc("listing_id")),
+    ],
+    "search_logs": [
+        unique(_asc("id")),
+        index(_desc("timestamp")),
+        index(_asc("city_key"), _desc("timestamp")),
+    ],
+    "documents": [
+        unique(_asc("id")),
+        index(_asc("user_id"), _desc("uploaded_at")),
+    ],
+    "applications": [
+        unique(_asc("id")),
+        unique(_asc("user_id"), _asc("listing_id")),
+        index(_asc("user_id"), _desc("created_at")),
+        index(_asc("listing_id"), _desc("created_at")),
+    ],
+    "messages": [
+        unique(_asc("id")),
+        index(_asc("read"), _asc("receiver_id")),
+        index(_asc("receiver_id"), _asc("listing_id"), _asc("created_at")),
+        index(_asc("pair"), _desc("created_at"), _desc("id")),
+        index(_asc("pair"), _asc("listing_id"), _desc("created_at"), _desc("id")),
+        index(_asc("listing_id")),
+    ],
+    "unread_counters": [
+        unique(_asc("user_id")),
+    ],
+    "conversations": [
+        unique(_asc("key")),
+        index(_asc("pair")),
+        index(_asc("participants"), _desc("last_message_date"), _desc("key")),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Create every registered index; a failing index is logged, not fatal"""
+    for collection, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as exc:
+                # e.g. duplicates already stored under a new unique index
+                logger.error("Could not create index %s on %s: %s", model.document["key"], collection, exc)
+
+
+# (route, collection, filter, sort) for the query each route runs
+CANONICAL_QUERIES = [
+    ("auth: get_current_user", "users", {"id": "u1"}, None),
+    ("POST /auth/register, /auth/login", "users", {"email": "owner@test.fr"}, None),
+    ("GET /admin/pending-verifications", "users", {"verification_status": "pending"}, [_desc("created_at")]),
+    ("GET /admin/all-users", "users", {}, [_desc("created_at")]),
+    ("GET /listings", "listings", {"structure_type": "MSP"}, [_desc("created_at"), _desc("id")]),
+    ("GET /listings?cursor=", "listings",
+     {"$or": [{"created_at": {"$lt": "2026-02-01"}}, {"created_at": "2026-02-01", "id": {"$lt": "l9"}}]},
+     [_desc("created_at"), _desc("id")]),
+    ("GET /listings?city=", "listings", {"city_key": {"$regex": "^lyon( |$)"}}, [_desc("created_at"), _desc("id")]),
+    ("GET /owner/stats/{listing_id}", "listings", {"city_key": "lyon"}, None),
+    ("GET /listings?q=", "listings", {"$text": {"$search": "kinésithérapeute"}, "structure_type": "MSP"}, None),
+    ("GET /listings/{id}", "listings", {"id": "l1"}, None),
+    ("GET /owner/stats", "listings", {"owner_id": "u1"}, None),
+    ("GET /owner/stats", "listing_counters", {"listing_id": {"$in": ["l1"]}}, None),
+    ("GET /owner/stats", "listing_views_daily", {"listing_id": {"$in": ["l1"]}, "day": {"$gte": "2026-01-01"}}, None),
+    ("GET /owner/stats", "messages",
+     {"receiver_id": "u1", "listing_id": {"$in": ["l1"]}, "created_at": {"$gte": "2026-01-01"}}, None),
+    ("GET /owner/stats/{listing_id}", "listing_views_daily", {"listing_id": "l1", "day": {"$gte": "2026-01-01"}}, None),
+    ("repair-counters", "listing_views", {"listing_id": {"$in": ["l1"]}}, None),
+    ("GET /favorites", "favorites", {"user_id": "u2"}, None),
+    ("POST /favorites", "favorites", {"user_id": "u2", "listing_id": "l1"}, None),
+    ("DELETE /listings/{id}", "listing_views_daily", {"listing_id": "l1"}, None),
+    ("GET /alerts", "alerts", {"user_id": "u2"}, [_desc("created_at")]),
+    ("GET /alerts/{id}/matches", "alerts", {"id": "a1", "user_id": "u2"}, None),
+    ("GET /alerts/{id}/matches", "alert_hits", {"alert_id": "a1"}, [_desc("listing_created_at"), _desc("listing_id")]),
+    ("alert index rebuild", "alerts", {"active": True}, None),
+    ("check-alerts", "alerts", {"active": True, "id": {"$gt": "a0"}}, [_asc("id")]),
+    ("check-alerts", "listings", {"created_at": {"$gt": "2026-01-01", "$lte": "2026-02-01"}}, None),
+    ("PUT /listings/{id}", "alert_hits", {"listing_id": "l1", "alert_id": {"$nin": ["a1"]}}, None),
+    ("GET /visits/practitioner", "visits", {"practitioner_id": "u2"}, [_asc("date")]),
+    ("GET /visits/owner", "visits", {"owner_id": "u1"}, [_asc("date")]),
+    ("PUT /visits/{id}/status", "visits", {"id": "v1"}, None),
+    ("GET /analytics/searches", "search_logs", {}, [_desc("timestamp")]),
+    ("GET /analytics/searches-by-city/{city}", "search_logs", {"city_key": {"$regex": "^lyon( |$)"}},
+     [_desc("timestamp")]),
+    ("GET /documents", "documents", {"user_id": "u2"}, [_desc("uploaded_at")]),
+    ("GET /documents/{id}/download", "documents", {"id": "d1"}, None),
+    ("POST /applications", "applications", {"user_id": "u2", "listing_id": "l1"}, None),
+    ("GET /applications/mine", "applications", {"user_id": "u2"}, [_desc("created_at")]),
+    ("GET /applications/received", "applications", {"listing_id": {"$in": ["l1"]}}, [_desc("created_at")]),
+    ("PUT /applications/{id}/status", "applications", {"id": "ap1"}, None),
+    ("GET /messages/conversations", "conversations", {"participants": "u1"},
+     [_desc("last_message_date"), _desc("key")]),
+    ("POST /messages", "conversations", {"key": "u1:u2:l1"}, None),
+    ("GET /messages/conversation/{id}", "conversations", {"pair": "u1:u2"}, None),
+    ("GET /messages/conversation/{id}", "messages", {"pair": "u1:u2"}, [_desc("created_at"), _desc("id")]),
+    ("GET /messages/conversation/{id}?before=", "messages",
+     {"pair": "u1:u2", "listing_id": "l1", "$or": [{"created_at": {"$lt": "2026-02-01"}},
+                                                  {"created_at": "2026-02-01", "id": {"$lt": "m9"}}]},
+     [_desc("created_at"), _desc("id")]),
+    ("GET /messages/conversation/{id}?after=", "messages",
+     {"pair": "u1:u2", "$or": [{"created_at": {"$gt": "2026-01-01"}},
+                               {"created_at": "2026-01-01", "id": {"$gt": "m0"}}]},
+     [_asc("created_at"), _asc("id")]),
+    ("GET /messages/unread-count", "unread_counters", {"user_id": "u1"}, None),
+    ("reconcile-unread", "messages", {"read": False}, None),
+    ("PUT /messages/{id}/read", "messages", {"id": "m1", "receiver_id": "u1"}, None),
+]
+
+SEED_DOCUMENTS = {
+    "users": [
+        {"id": "u1", "email": "owner@test.fr", "user_type": "proprietaire", "verification_status": "verified",
+         "created_at": "2026-01-01T00:00:00+00:00"},
+        {"id": "u2", "email": "tenant@test.fr", "user_type": "locataire", "verification_status": "pending",
+         "created_at": "2026-01-02T00:00:00+00:00"},
+    ],
+    "listings": [
+        {"id": "l1", "owner_id": "u1", "city": "Lyon", "city_key": "lyon", "structure_type": "MSP",
+         "title": "Cabinet de kinésithérapeute", "description": "Rez-de-chaussée, proche gare",
+         "location": {"type": "Point", "coordinates": [4.8357, 45.764]}, "created_at": "2026-01-03T00:00:00+00:00"},
+    ],
+    "listing_views": [{"id": "lv1", "listing_id": "l1", "timestamp": "2026-01-04T00:00:00+00:00"}],
+    "listing_views_daily": [{"listing_id": "l1", "day": "2026-01-04", "views": 1}],
+    "listing_counters": [{"listing_id": "l1", "views": 1}],
+    "favorites": [{"id": "f1", "user_id": "u2", "listing_id": "l1"}],
+    "alerts": [{"id": "a1", "user_id": "u2", "active": True, "created_at": "2026-01-04T00:00:00+00:00"}],
+    "alert_hits": [{"alert_id": "a1", "listing_id": "l1", "user_id": "u2",
+                    "listing_created_at": "2026-01-03T00:00:00+00:00"}],
+    "visits": [{"id": "v1", "listing_id": "l1", "practitioner_id": "u2", "owner_id": "u1", "date": "2026-02-01"}],
+    "search_logs": [{"id": "s1", "city": "Lyon", "city_key": "lyon", "timestamp": "2026-01-04T00:00:00+00:00"}],
+    "documents": [{"id": "d1", "user_id": "u2", "uploaded_at": "2026-01-04T00:00:00+00:00"}],
+    "applications": [{"id": "ap1", "user_id": "u2", "listing_id": "l1", "created_at": "2026-01-05T00:00:00+00:00"}],
+    "messages": [{"id": "m1", "sender_id": "u2", "receiver_id": "u1", "pair": "u1:u2", "listing_id": "l1",
+                  "read": False, "created_at": "2026-01-05T00:00:00+00:00"}],
+    "unread_counters": [{"user_id": "u1", "unread": 1}],
+    "conversations": [{"key": "u1:u2:l1", "pair": "u1:u2", "participants": ["u1", "u2"], "listing_id": "l1",
+                       "last_message_date": "2026-01-05T00:00:00+00:00", "unread": {"u1": 1}}],
+}
+
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        return plan.get("stage") == "COLLSCAN" or any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(v) for v in plan)
+    return False
+
+
+async def seed_explain_database(db):
+    """Reset a scratch database with the registered indexes and a few documents"""
+    for collection in await db.list_collection_names():
+        await db.drop_collection(collection)
+    await ensure_indexes(db)
+    for collection, documents in SEED_DOCUMENTS.items():
+        await db[collection].insert_many([dict(doc) for doc in documents])
+
+
+async def find_collscans(db) -> List[str]:
+    """Explain every canonical query; returns the routes whose plan is a COLLSCAN"""
+    failures = []
+    for route, collection, query, sort in CANONICAL_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        if _has_collscan(plan["queryPlanner"]["winningPlan"]):
+            failures.append(f"{route}: {collection}.find({query})")
+    return failures
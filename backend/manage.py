@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+CabLib maintenance commands
+Usage: python manage.py <command>
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from urllib.parse import urlparse
+
+import indexes
+import realtime
+import server
+
+
+async def backfill_locations():
+    updated = await server.backfill_listing_locations()
+    print(f"{updated} listing(s) geolocated")
+
+
+async def backfill_message_pairs():
+    updated = await server.backfill_message_pairs()
+    print(f"{updated} message(s) updated")
+
+
+async def generate_photo_variants():
+    generated = await server.generate_missing_photo_variants()
+    print(f"{generated} photo(s) resized")
+
+
+async def rebuild_alert_hits():
+    hits = await server.rebuild_alert_hits()
+    print(f"{hits} alert hit(s) recorded")
+
+
+async def check_alerts():
+    hits = await server.check_alerts_incrementally()
+    print(f"{hits} alert hit(s) found since the last check")
+
+
+async def rebuild_conversations():
+    conversations = await server.rebuild_conversations()
+    print(f"{conversations} conversation(s) rebuilt")
+
+
+async def reconcile_unread():
+    drift = await server.reconcile_unread_counters()
+    for entry in drift:
+        print(f"{entry['user_id']}: counter {entry['counter']}, actual {entry['actual']}")
+    print(f"{len(drift)} drifted unread counter(s) repaired")
+
+
+async def repair_counters():
+    drift = await server.rebuild_listing_counters()
+    for entry in drift:
+        print(f"{entry['listing_id']} {entry['field']}: counter {entry['counter']}, actual {entry['actual']}")
+    print(f"{len(drift)} drifted counter(s) repaired")
+
+
+async def backfill_city_keys():
+    updated = await server.backfill_city_keys()
+    for collection, count in updated.items():
+        print(f"{collection}: {count} document(s) updated")
+
+
+async def backfill_daily_views():
+    buckets = await server.backfill_daily_views()
+    print(f"{buckets} daily view bucket(s) in listing_views_daily")
+
+
+async def realtime_broker():
+    """Relay real-time events between workers; point REALTIME_BROKER_URL of each worker here"""
+    url = urlparse(os.environ.get("REALTIME_BROKER_URL", "tcp://127.0.0.1:7070"))
+    await realtime.run_broker(url.hostname, url.port)
+
+
+async def verify_indexes():
+    """Explain every route's query against a seeded scratch database"""
+    explain_db = server.client[f"{server.db.name}_explain"]
+    await indexes.seed_explain_database(explain_db)
+    try:
+        failures = await indexes.find_collscans(explain_db)
+    finally:
+        await server.client.drop_database(explain_db.name)
+    for failure in failures:
+        print(f"COLLSCAN {failure}")
+    print(f"{len(indexes.CANONICAL_QUERIES)} queries explained, {len(failures)} collection scan(s)")
+    if failures:
+        sys.exit(1)
+
+
+COMMANDS = {
+    "backfill-city-keys": backfill_city_keys,
+    "backfill-daily-views": backfill_daily_views,
+    "backfill-locations": backfill_locations,
+    "backfill-message-pairs": backfill_message_pairs,
+    "check-alerts": check_alerts,
+    "generate-photo-variants": generate_photo_variants,
+    "rebuild-conversations": rebuild_conversations,
+    "realtime-broker": realtime_broker,
+    "rebuild-alert-hits": rebuild_alert_hits,
+    "reconcile-unread": reconcile_unread,
+    "repair-counters": repair_counters,
+    "verify-indexes": verify_indexes,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CabLib maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    try:
+        asyncio.run(COMMANDS[args.command]())
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
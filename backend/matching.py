@@ -0,0 +1,173 @@
+"""
+Practitioner / listing matching
+
+calculate_match_score scores one listing and explains the score.
+MatchSnapshot keeps a columnar copy of the scored fields of every listing so
+that a profile can be scored against all of them in one NumPy pass; only the
+top-k listings are then loaded and explained with calculate_match_score.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+# Score weights (out of 100)
+CITY_POINTS = 30
+BUDGET_POINTS = 25
+BUDGET_ACCEPTABLE_POINTS = 15
+PROFESSION_POINTS = 20
+STRUCTURE_POINTS = 15
+NO_STRUCTURE_PREFERENCE_POINTS = 10
+SIZE_POINTS = 10
+
+# Listing fields read by the scoring, i.e. all a MatchSnapshot needs
+SCORED_FIELDS = ("id", "city", "monthly_rent", "size", "structure_type", "profiles_searched")
+
+
+def calculate_match_score(user: dict, listing: dict) -> tuple[int, List[str]]:
+    """
+    Calculate compatibility score between a practitioner and a listing
+    Returns: (score out of 100, list of matching reasons)
+    """
+    score = 0
+    reasons = []
+
+    # 1. Geographic match (30 points)
+    # For now, exact city match. Could be enhanced with distance calculation
+    if (listing.get("city") or "").lower() == (user.get("preferred_city") or "").lower():
+        score += CITY_POINTS
+        reasons.append(f"Localisation : {listing['city']}")
+
+    # 2. Budget match (25 points)
+    user_budget = user.get("max_budget") or 0
+    listing_rent = listing.get("monthly_rent") or 0
+    if user_budget > 0 and listing_rent > 0:
+        if listing_rent <= user_budget:
+            budget_diff = abs(listing_rent - user_budget) / user_budget
+            if budget_diff <= 0.2:  # Within 20%
+                score += BUDGET_POINTS
+                reasons.append(f"Budget adapté : {listing_rent}€/mois")
+            elif budget_diff <= 0.5:
+                score += BUDGET_ACCEPTABLE_POINTS
+                reasons.append(f"Budget acceptable : {listing_rent}€/mois")
+
+    # 3. Profession match (20 points)
+    user_profession = (user.get("profession") or "").lower()
+    profiles_searched = [p.lower() for p in listing.get("profiles_searched", [])]
+    if user_profession and any(user_profession in prof or prof in user_profession for prof in profiles_searched):
+        score += PROFESSION_POINTS
+        reasons.append(f"Profil recherché : {user.get('profession')}")
+
+    # 4. Structure type match (15 points)
+    user_pref_structure = user.get("preferred_structure_type") or ""
+    listing_structure = listing.get("structure_type", "")
+    if user_pref_structure and user_pref_structure == listing_structure:
+        score += STRUCTURE_POINTS
+        reasons.append(f"Type de structure : {listing_structure}")
+    elif not user_pref_structure:
+        score += NO_STRUCTURE_PREFERENCE_POINTS  # Partial points if no preference
+
+    # 5. Size match (10 points)
+    user_min_size = user.get("min_size") or 0
+    listing_size = listing.get("size") or 0
+    if user_min_size > 0 and listing_size >= user_min_size:
+        score += SIZE_POINTS
+        reasons.append(f"Surface suffisante : {listing_size}m²")
+
+    return score, reasons
+
+
+class MatchSnapshot:
+    """Columnar, read-only copy of the listings used for vectorized scoring"""
+
+    def __init__(self, listings: List[dict]):
+        """listings: at least SCORED_FIELDS; only the columns and the ids are kept"""
+        self.ids = [l["id"] for l in listings]
+        n = len(listings)
+        self.rent = np.array([l.get("monthly_rent") or 0 for l in listings], dtype=np.int64)
+        self.size = np.array([l.get("size") or 0 for l in listings], dtype=np.int64)
+
+        # Dictionary-encoded city and structure type
+        self.city_codes = {}
+        self.city = np.array(
+            [self.city_codes.setdefault((l.get("city") or "").lower(), len(self.city_codes)) for l in listings],
+            dtype=np.int32
+        )
+        self.structure_codes = {}
+        self.structure = np.array(
+            [self.structure_codes.setdefault(l.get("structure_type", ""), len(self.structure_codes))
+             for l in listings],
+            dtype=np.int32
+        )
+
+        # Searched professions as a bitmask over the profession vocabulary
+        self.professions = {}
+        for listing in listings:
+            for profile in listing.get("profiles_searched", []):
+                self.professions.setdefault(profile.lower(), len(self.professions))
+        words = max(1, (len(self.professions) + 63) // 64)
+        self.profession_mask = np.zeros((n, words), dtype=np.uint64)
+        for i, listing in enumerate(listings):
+            for profile in listing.get("profiles_searched", []):
+                bit = self.professions[profile.lower()]
+                self.profession_mask[i, bit // 64] |= np.uint64(1 << (bit % 64))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scores(self, user: dict) -> np.ndarray:
+        """Score of every listing for a profile, same rules as calculate_match_score"""
+        n = len(self.ids)
+        score = np.zeros(n, dtype=np.int64)
+
+        city = self.city_codes.get((user.get("preferred_city") or "").lower())
+        if city is not None:
+            score += np.where(self.city == city, CITY_POINTS, 0)
+
+        budget = user.get("max_budget") or 0
+        if budget > 0:
+            affordable = (self.rent > 0) & (self.rent <= budget)
+            diff = (budget - self.rent) / budget
+            score += np.where(affordable & (diff <= 0.2), BUDGET_POINTS,
+                              np.where(affordable & (diff <= 0.5), BUDGET_ACCEPTABLE_POINTS, 0))
+
+        profession = (user.get("profession") or "").lower()
+        if profession:
+            user_mask = np.zeros(self.profession_mask.shape[1], dtype=np.uint64)
+            for prof, bit in self.professions.items():
+                if profession in prof or prof in profession:
+                    user_mask[bit // 64] |= np.uint64(1 << (bit % 64))
+            matches = (self.profession_mask & user_mask).any(axis=1)
+            score += np.where(matches, PROFESSION_POINTS, 0)
+
+        structure = user.get("preferred_structure_type") or ""
+        if not structure:
+            score += NO_STRUCTURE_PREFERENCE_POINTS
+        elif structure in self.structure_codes:
+            score += np.where(self.structure == self.structure_codes[structure], STRUCTURE_POINTS, 0)
+
+        min_size = user.get("min_size") or 0
+        if min_size > 0:
+            score += np.where(self.size >= min_size, SIZE_POINTS, 0)
+
+        return score
+
+    def top(self, user: dict, limit: int, offset: int = 0) -> List[Tuple[int, int]]:
+        """
+        Best matching listings with a positive score, best first
+        Ties keep the snapshot order, like a stable sort.
+        Returns: [(listing index, score)]
+        """
+        scores = self.scores(user)
+        candidates = np.flatnonzero(scores > 0)
+        k = offset + limit
+        if k <= 0 or len(candidates) == 0:
+            return []
+        # Unique sort key: score first, then snapshot order
+        n = len(self.ids)
+        keys = scores[candidates] * n + (n - 1 - candidates)
+        if k < len(candidates):
+            part = np.argpartition(-keys, k - 1)[:k]
+            candidates, keys = candidates[part], keys[part]
+        order = candidates[np.argsort(-keys)][offset:k]
+        return [(int(i), int(scores[i])) for i in order]
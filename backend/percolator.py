@@ -0,0 +1,171 @@
+"""
+Reverse index of search alerts ("percolator")
+
+Instead of running every alert as a query, active alerts are compiled into an
+in-memory index and each written listing is matched against it:
+- location: alerts with a radius are registered in every grid cell their
+  circle overlaps, alerts on a city under its normalized city key, and alerts
+  without a city in a catch-all bucket
+- structure type: each location bucket is split by structure type (None for
+  alerts accepting any structure)
+- rent ceiling: each bucket keeps its alerts sorted by max_rent, so a bisect
+  returns only the alerts whose ceiling the listing rent fits under
+The few candidates left are then checked for size floor and profession, and
+the distances to the centers of those with a radius are computed in one
+NumPy pass.
+"""
+
+import math
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from distances import EARTH_RADIUS_KM, haversine_distance, nearest
+from gazetteer import normalize_city
+
+NO_CEILING = float("inf")
+
+
+class CompiledAlert:
+    __slots__ = ("id", "user_id", "created_at", "center", "radius_km", "max_rent", "min_size", "profession")
+
+    def __init__(self, alert: dict, center: Optional[Tuple[float, float]]):
+        self.id = alert["id"]
+        self.user_id = alert["user_id"]
+        self.created_at = alert["created_at"]
+        self.center = center
+        self.radius_km = alert.get("radius") if center else None
+        self.max_rent = alert.get("max_rent") or NO_CEILING
+        self.min_size = alert.get("min_size") or 0
+        self.profession = (alert.get("profession") or "").lower()
+
+    def accepts_attributes(self, listing: dict) -> bool:
+        """Every criterion but the distance"""
+        if self.min_size and (listing.get("size") or 0) < self.min_size:
+            return False
+        return not self.profession or any(
+            self.profession in profile.lower() for profile in listing.get("profiles_searched", [])
+        )
+
+    def accepts(self, listing: dict, coordinates: Optional[Tuple[float, float]]) -> bool:
+        """One alert on its own; AlertIndex.match batches the distances instead"""
+        if not self.accepts_attributes(listing):
+            return False
+        if self.radius_km:
+            if coordinates is None:
+                return False
+            return haversine_distance(self.center[0], self.center[1], coordinates[0], coordinates[1]) <= self.radius_km
+        return True
+
+
+class AlertIndex:
+    def __init__(self, geocode, cell_degrees: float = 0.5):
+        """geocode(city) -> (lat, lon) or None, used for alerts with a radius"""
+        self.geocode = geocode
+        self.cell_degrees = cell_degrees
+        # location bucket -> structure type (or None) -> [(max_rent, alert id)] sorted
+        self._buckets: Dict[tuple, Dict[Optional[str], List[Tuple[float, str]]]] = {}
+        self._alerts: Dict[str, CompiledAlert] = {}
+        self._locations: Dict[str, List[tuple]] = {}
+        self._structures: Dict[str, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return ("cell", math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _cells_around(self, lat: float, lon: float, radius_km: float) -> List[tuple]:
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+        _, lat_min, lon_min = self._cell(lat - dlat, lon - dlon)
+        _, lat_max, lon_max = self._cell(lat + dlat, lon + dlon)
+        return [("cell", i, j) for i in range(lat_min, lat_max + 1) for j in range(lon_min, lon_max + 1)]
+
+    def add(self, alert: dict):
+        """Register (or re-register) an alert; inactive alerts are removed"""
+        self.remove(alert["id"])
+        if not alert.get("active", True):
+            return
+        city = alert.get("city")
+        center = self.geocode(city) if city and alert.get("radius") else None
+        compiled = CompiledAlert(alert, center)
+        if center:
+            locations = self._cells_around(center[0], center[1], compiled.radius_km)
+        elif city and normalize_city(city):
+            locations = [("city", normalize_city(city))]
+        else:
+            locations = [("anywhere",)]
+        structure = alert.get("structure_type") or None
+
+        self._alerts[compiled.id] = compiled
+        self._locations[compiled.id] = locations
+        self._structures[compiled.id] = structure
+        for location in locations:
+            insort(self._buckets.setdefault(location, {}).setdefault(structure, []), (compiled.max_rent, compiled.id))
+
+    def remove(self, alert_id: str):
+        compiled = self._alerts.pop(alert_id, None)
+        if compiled is None:
+            return
+        structure = self._structures.pop(alert_id)
+        for location in self._locations.pop(alert_id):
+            by_structure = self._buckets[location]
+            entries = by_structure[structure]
+            entries.remove((compiled.max_rent, alert_id))
+            if not entries:
+                del by_structure[structure]
+                if not by_structure:
+                    del self._buckets[location]
+
+    def _location_keys(self, listing: dict, coordinates: Optional[Tuple[float, float]]) -> List[tuple]:
+        keys = [("anywhere",)]
+        # An alert on "paris" also matches "paris 15e arrondissement", like city_key_filter
+        words = (listing.get("city_key") or normalize_city(listing.get("city") or "")).split()
+        keys += [("city", " ".join(words[:n])) for n in range(1, len(words) + 1)]
+        if coordinates is not None:
+            keys.append(self._cell(*coordinates))
+        return keys
+
+    def match(self, listing: dict) -> List[CompiledAlert]:
+        """Every registered alert the listing matches"""
+        location = listing.get("location")
+        # GeoJSON stores [lon, lat]
+        coordinates = (location["coordinates"][1], location["coordinates"][0]) if location else None
+        rent = listing.get("monthly_rent") or 0
+        structures = {listing.get("structure_type") or None, None}
+
+        matches = {}
+        with_radius = {}
+        for key in self._location_keys(listing, coordinates):
+            by_structure = self._buckets.get(key)
+            if not by_structure:
+                continue
+            for structure in structures:
+                entries = by_structure.get(structure)
+                if not entries:
+                    continue
+                # Entries are sorted by ceiling: skip those below the rent
+                for _, alert_id in entries[bisect_left(entries, (rent, "")):]:
+                    if alert_id in matches or alert_id in with_radius:
+                        continue
+                    compiled = self._alerts[alert_id]
+                    if not compiled.accepts_attributes(listing):
+                        continue
+                    if compiled.radius_km:
+                        with_radius[alert_id] = compiled
+                    else:
+                        matches[alert_id] = compiled
+
+        if with_radius and coordinates is not None:
+            # Radius alerts only come from the listing's grid cell: one distance pass for all of them
+            candidates = list(with_radius.values())
+            within, _ = nearest(
+                coordinates[0], coordinates[1],
+                [alert.center[0] for alert in candidates], [alert.center[1] for alert in candidates],
+                radius_km=np.array([alert.radius_km for alert in candidates], dtype=np.float64)
+            )
+            for i in within:
+                matches[candidates[i].id] = candidates[i]
+        return list(matches.values())
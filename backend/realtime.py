@@ -0,0 +1,246 @@
+"""
+Real-time events (new messages, unread counts) pushed to connected clients
+
+The Hub keeps, per user, the queues of that user's open WebSocket / SSE
+connections. publish() goes through a backend:
+- LocalBackend delivers in process (single worker)
+- BrokerBackend also forwards every event to a broker process that fans it
+  out to the other workers, so a receiver connected to another worker still
+  gets it. run_broker() is that broker: newline-delimited JSON over TCP.
+
+Delivery is best-effort: a connection whose queue is full loses the event
+(clients resynchronize through the REST API when they reconnect).
+"""
+
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, dict], None]
+
+
+class LocalBackend:
+    """Single worker: events are delivered in process"""
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def publish(self, user_id: str, event: dict):
+        self._deliver(user_id, event)
+
+    async def stop(self):
+        pass
+
+
+class BrokerBackend:
+    """Several workers: events are also relayed to the other workers through run_broker()"""
+
+    def __init__(self, url: str, reconnect_delay: float = 1.0, outgoing_size: int = 1000):
+        parsed = urlparse(url)
+        self.host, self.port = parsed.hostname, parsed.port
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        # Events waiting for the broker: publish() never waits on the socket
+        self._outgoing: asyncio.Queue = asyncio.Queue(maxsize=outgoing_size)
+        self.dropped = 0
+        self._task = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        self._task = asyncio.create_task(self._run())
+
+    async def publish(self, user_id: str, event: dict):
+        # Local receivers never wait for the broker, nor miss events while it is down
+        self._deliver(user_id, event)
+        if not self.connected:
+            return
+        try:
+            self._outgoing.put_nowait(json.dumps({"user_id": user_id, "event": event}).encode() + b"\n")
+        except asyncio.QueueFull:
+            # Broker stalled: drop rather than hold up the request
+            self.dropped += 1
+
+    async def _send(self, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                writer.write(await self._outgoing.get())
+                await writer.drain()
+        except (ConnectionError, OSError):
+            # The reading side sees the connection end and reconnects
+            writer.close()
+
+    def _relay(self, line: bytes):
+        try:
+            relayed = json.loads(line)
+            self._deliver(relayed["user_id"], relayed["event"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Skipped a malformed real-time broker frame")
+
+    async def _run(self):
+        while True:
+            writer = sender = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=2 ** 20)
+                sender = asyncio.create_task(self._send(writer))
+                self.connected = True
+                while True:
+                    try:
+                        line = await reader.readline()
+                    except ValueError:
+                        # Line over the limit: readline discarded it
+                        logger.warning("Skipped an oversized real-time broker frame")
+                        continue
+                    if not line:
+                        break
+                    self._relay(line)
+            except (ConnectionError, OSError) as exc:
+                logger.warning("Real-time broker unavailable: %s", exc)
+            except Exception:
+                # Anything else must not end the relay for good
+                logger.exception("Real-time broker relay failed")
+            finally:
+                self.connected = False
+                if sender is not None:
+                    sender.cancel()
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def backend_from_url(url: Optional[str]):
+    return BrokerBackend(url) if url else LocalBackend()
+
+
+class Hub:
+    def __init__(self, backend=None, queue_size: int = 100):
+        self.backend = backend or LocalBackend()
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.metrics = {"published": 0, "delivered": 0, "dropped": 0}
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    async def publish(self, user_id: str, event: dict):
+        self.metrics["published"] += 1
+        await self.backend.publish(user_id, event)
+
+    def _deliver(self, user_id: str, event: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+                self.metrics["delivered"] += 1
+            except asyncio.QueueFull:
+                self.metrics["dropped"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "broker_connected": getattr(self.backend, "connected", None),
+            "broker_dropped": getattr(self.backend, "dropped", None)
+        }
+
+
+async def websocket_session(websocket, hub: Hub, user_id: str, initial: List[dict] = ()):
+    """Forward the user's events to an accepted WebSocket until the client disconnects"""
+    queue = hub.subscribe(user_id)
+    for event in initial:
+        queue.put_nowait(event)
+
+    async def forward():
+        while True:
+            await websocket.send_json(await queue.get())
+
+    async def receive():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # The session ends with whichever side stops first (client gone, or send failed)
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.debug("WebSocket session of %s ended: %r", user_id, result)
+        hub.unsubscribe(user_id, queue)
+
+
+async def event_stream(hub: Hub, user_id: str, request, initial: List[dict] = (), keepalive: float = 25.0):
+    """Server-Sent Events body: the user's events, plus a comment line every keepalive seconds"""
+    queue = hub.subscribe(user_id)
+    for event in initial:
+        queue.put_nowait(event)
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        hub.unsubscribe(user_id, queue)
+
+
+async def run_broker(host: str = "127.0.0.1", port: int = 7070):
+    """Relay every event received from one worker to all the other workers"""
+    workers: Set[asyncio.StreamWriter] = set()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        workers.add(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Oversized frame, discarded by readline: keep the worker connected
+                    logger.warning("Skipped an oversized frame")
+                    continue
+                if not line:
+                    break
+                for other in list(workers):
+                    if other is not writer:
+                        other.write(line)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            workers.discard(writer)
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port, limit=2 ** 20)
+    logger.info("Real-time broker listening on %s:%d", host, port)
+    async with server:
+        await server.serve_forever()
@@ -1,22 +1,39 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Form, Request, Response, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
+import time
 import logging
 import shutil
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
+import base64
+import json
+import re
 from datetime import datetime, timezone, timedelta
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-import math
-import aiofiles
+
+from cache import TTLCache
+from distances import EARTH_RADIUS_KM, nearest
+from file_responses import IMMUTABLE, serve_file
+from gazetteer import Gazetteer, normalize_city
+from images import FORMATS, VARIANTS, ImagePipeline, best_variant, is_variant, variant_path
+from indexes import ensure_indexes
+from matching import SCORED_FIELDS, MatchSnapshot, calculate_match_score
+from passwords import PasswordHasher, PasswordHasherBusy
+from percolator import AlertIndex
+from realtime import Hub, backend_from_url, event_stream, websocket_session
+from uploads import MULTIPART_OVERHEAD, ReceivedUpload, UploadBudget, UploadBudgetExhausted, UploadError, receive_upload
+from view_buffer import ViewBuffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,7 +44,12 @@ client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on a bounded thread pool; 503 once BCRYPT_MAX_PENDING calls are waiting
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+    workers=int(os.environ.get('BCRYPT_WORKERS', min(4, os.cpu_count() or 1))),
+    max_pending=int(os.environ.get('BCRYPT_MAX_PENDING', 64))
+)
 SECRET_KEY = os.environ.get('SECRET_KEY', 'cablib-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
@@ -41,67 +63,62 @@ api_router = APIRouter(prefix="/api")
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# City coordinates for radius search (major French cities)
-CITY_COORDINATES = {
-    "paris": (48.8566, 2.3522),
-    "lyon": (45.7640, 4.8357),
-    "marseille": (43.2965, 5.3698),
-    "toulouse": (43.6047, 1.4442),
-    "nice": (43.7102, 7.2620),
-    "nantes": (47.2184, -1.5536),
-    "strasbourg": (48.5734, 7.7521),
-    "montpellier": (43.6108, 3.8767),
-    "bordeaux": (44.8378, -0.5792),
-    "lille": (50.6292, 3.0573),
-    "rennes": (48.1173, -1.6778),
-    "reims": (49.2583, 4.0317),
-    "saint-etienne": (45.4397, 4.3872),
-    "toulon": (43.1242, 5.9280),
-    "grenoble": (45.1885, 5.7245),
-    "dijon": (47.3220, 5.0415),
-    "angers": (47.4784, -0.5632),
-    "nimes": (43.8367, 4.3601),
-    "clermont-ferrand": (45.7772, 3.0870),
-    "tours": (47.3941, 0.6848),
-    "amiens": (49.8941, 2.2958),
-    "limoges": (45.8336, 1.2611),
-    "metz": (49.1193, 6.1757),
-    "besancon": (47.2378, 6.0241),
-    "perpignan": (42.6887, 2.8948),
-    "orleans": (47.9029, 1.9093),
-    "caen": (49.1829, -0.3707),
-    "rouen": (49.4432, 1.0993),
-    "nancy": (48.6921, 6.1844),
-    "avignon": (43.9493, 4.8055),
-}
-
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate the great circle distance between two points on earth (in km)"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
+# Bytes of all uploads being received; past UPLOAD_MAX_IN_FLIGHT new uploads
+# wait for room, and get a 503 after UPLOAD_WAIT_TIMEOUT seconds
+UPLOAD_BUDGET = UploadBudget(
+    max_bytes=int(os.environ.get('UPLOAD_MAX_IN_FLIGHT', 64 * 1024 * 1024)),
+    timeout=float(os.environ.get('UPLOAD_WAIT_TIMEOUT', 10))
+)
+
+async def receive_file(request: Request, directory: Path, max_size: int, allowed_types: set,
+                       type_error: str) -> ReceivedUpload:
+    """Stream the uploaded file into a temporary file in directory, within the in-flight byte budget"""
+    too_large = f"Fichier trop volumineux (max {max_size // (1024 * 1024)}MB)"
+    try:
+        declared = int(request.headers.get("content-length", max_size + MULTIPART_OVERHEAD))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    # Rejected before reading a single byte
+    if declared > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=400, detail=too_large)
+    try:
+        async with UPLOAD_BUDGET.reserve(declared):
+            return await receive_upload(request, directory, max_size, allowed_types, type_error=type_error)
+    except UploadBudgetExhausted:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "5"})
+    except UploadError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+# Offline commune gazetteer for radius search (memory-mapped, see build_gazetteer.py)
+GAZETTEER = Gazetteer(ROOT_DIR / "data" / "communes.bin")
+# Fewer communes than this: still the seed file shipped with the repository
+FULL_GAZETTEER_MIN_COMMUNES = 30000
 
 def get_city_coordinates(city_name: str) -> Optional[tuple]:
-    """Get coordinates for a city name"""
-    if not city_name:
+    """Get coordinates for a city name or postal code"""
+    index = GAZETTEER.lookup(city_name)
+    if index is None:
+        return None
+    return GAZETTEER.coordinates(index)
+
+def listing_location(city_name: str) -> Optional[dict]:
+    """GeoJSON point for a listing's city, indexed with 2dsphere for radius search"""
+    coords = get_city_coordinates(city_name)
+    if not coords:
         return None
-    normalized = city_name.lower().strip().replace("-", " ").replace("saint", "st")
-    # Try exact match first
-    if normalized in CITY_COORDINATES:
-        return CITY_COORDINATES[normalized]
-    # Try partial match
-    for city, coords in CITY_COORDINATES.items():
-        if normalized in city or city in normalized:
-            return coords
-    return None
+    # GeoJSON order is [longitude, latitude]
+    return {"type": "Point", "coordinates": [coords[1], coords[0]]}
+
+def city_key_filter(city: str) -> Optional[dict]:
+    """
+    Index-friendly filter on the normalized city_key field: the exact city, or
+    a city key starting with it as a whole word ("paris" matches "paris 15e",
+    "nice" does not match "venice")
+    """
+    key = normalize_city(city)
+    if not key:
+        return None
+    return {"$regex": f"^{re.escape(key)}( |$)"}
 
 # Models
 class UserRegister(BaseModel):
@@ -197,6 +214,8 @@ class Listing(BaseModel):
     parking_spots: Optional[int] = None
     is_pmr_accessible: bool = False
     pmr_details: Optional[str] = None
+    # Only set by radius search
+    distance_km: Optional[float] = None
 
 class FavoriteCreate(BaseModel):
     listing_id: str
@@ -231,6 +250,7 @@ class Alert(BaseModel):
     active: bool
     created_at: str
     last_checked: Optional[str]
+    new_count: int = 0
 
 class VisitCreate(BaseModel):
     listing_id: str
@@ -327,65 +347,19 @@ class MatchResult(BaseModel):
     score: int
     reasons: List[str]
 
-# Matching Algorithm
-def calculate_match_score(user: dict, listing: dict) -> tuple[int, List[str]]:
-    """
-    Calculate compatibility score between a practitioner and a listing
-    Returns: (score out of 100, list of matching reasons)
-    """
-    score = 0
-    reasons = []
-    
-    # 1. Geographic match (30 points)
-    # For now, exact city match. Could be enhanced with distance calculation
-    if listing.get("city", "").lower() == user.get("preferred_city", "").lower():
-        score += 30
-        reasons.append(f"Localisation : {listing['city']}")
-    
-    # 2. Budget match (25 points)
-    user_budget = user.get("max_budget", 0)
-    listing_rent = listing.get("monthly_rent", 0)
-    if user_budget > 0 and listing_rent > 0:
-        if listing_rent <= user_budget:
-            budget_diff = abs(listing_rent - user_budget) / user_budget
-            if budget_diff <= 0.2:  # Within 20%
-                score += 25
-                reasons.append(f"Budget adapté : {listing_rent}€/mois")
-            elif budget_diff <= 0.5:
-                score += 15
-                reasons.append(f"Budget acceptable : {listing_rent}€/mois")
-    
-    # 3. Profession match (20 points)
-    user_profession = user.get("profession", "").lower()
-    profiles_searched = [p.lower() for p in listing.get("profiles_searched", [])]
-    if user_profession and any(user_profession in prof or prof in user_profession for prof in profiles_searched):
-        score += 20
-        reasons.append(f"Profil recherché : {user.get('profession')}")
-    
-    # 4. Structure type match (15 points)
-    user_pref_structure = user.get("preferred_structure_type", "")
-    listing_structure = listing.get("structure_type", "")
-    if user_pref_structure and user_pref_structure == listing_structure:
-        score += 15
-        reasons.append(f"Type de structure : {listing_structure}")
-    elif not user_pref_structure:
-        score += 10  # Partial points if no preference
-    
-    # 5. Size match (10 points)
-    user_min_size = user.get("min_size", 0)
-    listing_size = listing.get("size", 0)
-    if user_min_size > 0 and listing_size >= user_min_size:
-        score += 10
-        reasons.append(f"Surface suffisante : {listing_size}m²")
-    
-    return score, reasons
-
 # Helper functions
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Returns (valid, new hash if the stored one must be rehashed with the current cost)"""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -393,19 +367,44 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Already verified tokens -> claims, and users by id (without password hash),
+# so that most authenticated requests need neither a signature check nor a
+# database read. Users changed by another worker are refreshed after USER_CACHE_TTL.
+TOKEN_CACHE = TTLCache(max_size=int(os.environ.get('TOKEN_CACHE_SIZE', 10000)))
+USER_CACHE = TTLCache(
+    max_size=int(os.environ.get('USER_CACHE_SIZE', 5000)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 60))
+)
+
+def decode_access_token(token: str) -> dict:
+    claims = TOKEN_CACHE.get(token)
+    if claims is None or claims.get("exp", 0) <= time.time():
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        TOKEN_CACHE.set(token, claims)
+    return claims
+
+def invalidate_cached_user(user_id: str):
+    USER_CACHE.pop(user_id)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    return await user_from_token(credentials.credentials)
+
+async def user_from_token(token: str) -> dict:
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
+        payload = decode_access_token(token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    user = USER_CACHE.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        USER_CACHE.set(user_id, user)
+    # Handlers get their own copy of the cached document
+    return dict(user)
 
 # Auth routes
 @api_router.post("/auth/register", response_model=Token)
@@ -438,7 +437,7 @@ async def register(user_data: UserRegister):
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password": hash_password(user_data.password),
+        "password": await hash_password(user_data.password),
         "first_name": user_data.first_name,
         "last_name": user_data.last_name,
         "rpps_number": user_data.rpps_number if user_data.rpps_number else None,
@@ -452,7 +451,11 @@ async def register(user_data: UserRegister):
         "preferred_structure_type": user_data.preferred_structure_type,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # Concurrent registration with the same email (unique index on users.email)
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create token
     access_token = create_access_token(data={"sub": user_id})
@@ -475,8 +478,14 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login", response_model=Token)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password"]):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await verify_password(credentials.password, user["password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this password was hashed
+        await db.users.update_one({"id": user["id"]}, {"$set": {"password": new_hash}})
     
     access_token = create_access_token(data={"sub": user["id"]})
     
@@ -511,6 +520,53 @@ async def get_me(current_user: dict = Depends(get_current_user)):
     )
 
 # Listings routes
+
+# Versions of shared data sets ("listings", "alerts"), bumped on every write.
+# Shared between workers through the versions collection and re-read at most
+# every VERSION_TTL seconds.
+VERSION_TTL = 5
+versions = {}
+
+async def bump_version(name: str):
+    doc = await db.versions.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    versions[name] = {"value": doc["value"], "checked_at": time.monotonic()}
+
+async def get_version(name: str) -> int:
+    version = versions.get(name)
+    if version is None or time.monotonic() - version["checked_at"] > VERSION_TTL:
+        doc = await db.versions.find_one({"_id": name})
+        version = versions[name] = {"value": doc["value"] if doc else 0, "checked_at": time.monotonic()}
+    return version["value"]
+
+# Periodic jobs start in every worker but run in one: each pass first takes a
+# lease in the leases collection, held until it expires or is renewed by the
+# same worker. Another worker takes over once the holder stops renewing.
+WORKER_ID = str(uuid.uuid4())
+
+async def acquire_lease(name: str, ttl: float) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.update_one(
+            {"_id": name, "$or": [{"holder": WORKER_ID}, {"expires_at": {"$lte": now.isoformat()}}]},
+            {"$set": {"holder": WORKER_ID, "expires_at": (now + timedelta(seconds=ttl)).isoformat()}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Held by another worker: the upsert tried to insert a second lease
+        return False
+    return True
+
+async def bump_listings_version():
+    await bump_version("listings")
+
+async def get_listings_version() -> int:
+    return await get_version("listings")
+
 @api_router.post("/listings", response_model=Listing)
 async def create_listing(listing_data: ListingCreate, current_user: dict = Depends(get_current_user)):
     if current_user["user_type"] != "proprietaire":
@@ -521,75 +577,30 @@ async def create_listing(listing_data: ListingCreate, current_user: dict = Depen
         "id": listing_id,
         "owner_id": current_user["id"],
         "created_at": datetime.now(timezone.utc).isoformat(),
-        **listing_data.model_dump()
+        **listing_data.model_dump(),
+        "city_key": normalize_city(listing_data.city)
     }
+    location = listing_location(listing_data.city)
+    if location:
+        listing_doc["location"] = location
     await db.listings.insert_one(listing_doc)
+    KNOWN_LISTING_IDS.add(listing_id)
+    await bump_listings_version()
+    await percolate_listing(listing_doc, is_new=True)
     
     return Listing(**listing_doc)
 
-@api_router.get("/listings", response_model=List[Listing])
-async def get_listings(
-    city: Optional[str] = None,
+def build_listing_filters(
     structure_type: Optional[str] = None,
     min_size: Optional[int] = None,
     max_rent: Optional[int] = None,
     profession: Optional[str] = None,
-    radius: Optional[int] = None,
-    # New filters
     has_parking: Optional[bool] = None,
     is_pmr_accessible: Optional[bool] = None,
-    equipments: Optional[str] = None  # Comma-separated list
-):
+    equipments: Optional[str] = None
+) -> dict:
+    """Build the Mongo filter for the structured listing search fields"""
     query = {}
-    
-    # If radius search is requested
-    if city and radius and radius > 0:
-        center_coords = get_city_coordinates(city)
-        if center_coords:
-            # Get all listings and filter by distance
-            all_listings = await db.listings.find({}, {"_id": 0}).to_list(500)
-            filtered_listings = []
-            
-            for listing in all_listings:
-                listing_coords = get_city_coordinates(listing.get("city", ""))
-                if listing_coords:
-                    distance = haversine_distance(
-                        center_coords[0], center_coords[1],
-                        listing_coords[0], listing_coords[1]
-                    )
-                    if distance <= radius:
-                        # Apply other filters
-                        if structure_type and listing.get("structure_type") != structure_type:
-                            continue
-                        if min_size and listing.get("size", 0) < min_size:
-                            continue
-                        if max_rent and listing.get("monthly_rent", 0) > max_rent:
-                            continue
-                        if profession:
-                            profiles = listing.get("profiles_searched", [])
-                            if not any(profession.lower() in p.lower() for p in profiles):
-                                continue
-                        # New filters
-                        if has_parking is not None and listing.get("has_parking", False) != has_parking:
-                            continue
-                        if is_pmr_accessible is not None and listing.get("is_pmr_accessible", False) != is_pmr_accessible:
-                            continue
-                        if equipments:
-                            required_equips = [e.strip() for e in equipments.split(",")]
-                            listing_equips = listing.get("equipments", [])
-                            if not all(eq in listing_equips for eq in required_equips):
-                                continue
-                        
-                        listing["distance_km"] = round(distance, 1)
-                        filtered_listings.append(listing)
-            
-            # Sort by distance
-            filtered_listings.sort(key=lambda x: x.get("distance_km", 999))
-            return [Listing(**listing) for listing in filtered_listings]
-    
-    # Standard search without radius
-    if city:
-        query["city"] = {"$regex": city, "$options": "i"}
     if structure_type:
         query["structure_type"] = structure_type
     if min_size:
@@ -598,7 +609,6 @@ async def get_listings(
         query["monthly_rent"] = {"$lte": max_rent}
     if profession:
         query["profiles_searched"] = {"$regex": profession, "$options": "i"}
-    # New filters
     if has_parking is not None:
         query["has_parking"] = has_parking
     if is_pmr_accessible is not None:
@@ -606,10 +616,285 @@ async def get_listings(
     if equipments:
         required_equips = [e.strip() for e in equipments.split(",")]
         query["equipments"] = {"$all": required_equips}
+    return query
+
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(sort_key: str, *values) -> str:
+    """Opaque pagination token holding the sort key of the last returned item"""
+    raw = json.dumps([sort_key, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+# Expected type of a numeric cursor value (bool excluded below)
+NUMBER = (int, float)
+
+def decode_cursor(cursor: str, sort_key: str, types: tuple = (str, str)) -> list:
+    """
+    The values of a cursor made by encode_cursor(sort_key, ...); 400 for anything else
+    types gives the expected type of each value, e.g. (NUMBER, str) for (distance, id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        decoded = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(decoded, list) or len(decoded) != len(types) + 1:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    key, *values = decoded
+    if key != sort_key:
+        raise HTTPException(status_code=400, detail="Cursor does not match this search")
+    # Values go into Mongo filters and stages: the expected scalars only, never operator documents
+    if not all(
+        isinstance(value, expected) and not isinstance(value, bool) for value, expected in zip(values, types)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def geo_near_stage(center_coords: tuple, radius: int, query: dict) -> dict:
+    """$geoNear stage: listings within radius km of center_coords matching query, nearest first"""
+    return {"$geoNear": {
+        "near": {"type": "Point", "coordinates": [center_coords[1], center_coords[0]]},
+        "distanceField": "distance_m",
+        "maxDistance": radius * 1000,
+        "query": query,
+        "spherical": True
+    }}
+
+def text_search_match(q: str, query: dict, city: Optional[str], center_coords: Optional[tuple], radius: Optional[int]) -> dict:
+    """$match for a keyword search; the radius becomes $geoWithin since $geoNear cannot run with $text"""
+    match = {**query, "$text": {"$search": q}}
+    if center_coords:
+        match["location"] = {"$geoWithin": {"$centerSphere": [
+            [center_coords[1], center_coords[0]], radius / EARTH_RADIUS_KM
+        ]}}
+    elif city and city_key_filter(city):
+        match["city_key"] = city_key_filter(city)
+    return match
+
+async def search_listings_text(
+    response: Response,
+    q: str,
+    query: dict,
+    city: Optional[str],
+    radius: Optional[int],
+    cursor: Optional[str],
+    limit: int
+) -> List[Listing]:
+    """
+    Keyword search over the listings text index (French stemming, accent
+    insensitive), combined with the other filters and sorted by relevance.
+    Distances are computed for the returned page only.
+    """
+    center_coords = get_city_coordinates(city) if city and radius and radius > 0 else None
+    match = text_search_match(q, query, city, center_coords, radius)
+    pipeline = [{"$match": match}, {"$addFields": {"score": {"$meta": "textScore"}}}]
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, "score", (NUMBER, str))
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": last_score}},
+            {"score": last_score, "id": {"$gt": last_id}}
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "id": 1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0}}
+    ]
+    listings = await db.listings.aggregate(pipeline).to_list(limit + 1)
+    if len(listings) > limit:
+        listings = listings[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("score", listings[-1]["score"], listings[-1]["id"])
+    
+    if center_coords and listings:
+        # The page stays ranked by relevance; nearest() only supplies the distances
+        coordinates = [l["location"]["coordinates"] for l in listings]
+        indices, distances = nearest(center_coords[0], center_coords[1],
+                                     [lat for _, lat in coordinates], [lon for lon, _ in coordinates])
+        for i, distance in zip(indices, distances):
+            listings[i]["distance_km"] = round(float(distance), 1)
+    return [Listing(**listing) for listing in listings]
+
+@api_router.get("/listings", response_model=List[Listing])
+async def get_listings(
+    response: Response,
+    city: Optional[str] = None,
+    structure_type: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_rent: Optional[int] = None,
+    profession: Optional[str] = None,
+    radius: Optional[int] = None,
+    # New filters
+    has_parking: Optional[bool] = None,
+    is_pmr_accessible: Optional[bool] = None,
+    equipments: Optional[str] = None,  # Comma-separated list
+    # Keywords searched in title and description
+    q: Optional[str] = None,
+    # Keyset pagination: pass the X-Next-Cursor header of the previous page
+    cursor: Optional[str] = None,
+    limit: int = MAX_PAGE_SIZE
+):
+    query = build_listing_filters(
+        structure_type=structure_type,
+        min_size=min_size,
+        max_rent=max_rent,
+        profession=profession,
+        has_parking=has_parking,
+        is_pmr_accessible=is_pmr_accessible,
+        equipments=equipments
+    )
     
-    listings = await db.listings.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    # Keyword search: French text index on title and description, ranked by relevance
+    if q and q.strip():
+        return await search_listings_text(response, q, query, city, radius, cursor, limit)
+    
+    # If radius search is requested
+    if city and radius and radius > 0:
+        center_coords = get_city_coordinates(city)
+        if center_coords:
+            # $geoNear uses the 2dsphere index, applies the other filters and sorts by distance.
+            # Pages continue from the last (distance, id) through minDistance.
+            pipeline = [geo_near_stage(center_coords, radius, query)]
+            if cursor:
+                last_distance, last_id = decode_cursor(cursor, "distance", (NUMBER, str))
+                pipeline[0]["$geoNear"]["minDistance"] = last_distance
+                pipeline.append({"$match": {"$or": [
+                    {"distance_m": {"$gt": last_distance}},
+                    {"distance_m": last_distance, "id": {"$gt": last_id}}
+                ]}})
+            pipeline += [
+                {"$sort": {"distance_m": 1, "id": 1}},
+                {"$limit": limit + 1},
+                {"$addFields": {"distance_km": {"$round": [{"$divide": ["$distance_m", 1000]}, 1]}}},
+                {"$project": {"_id": 0, "location": 0}}
+            ]
+            listings = await db.listings.aggregate(pipeline).to_list(limit + 1)
+            if len(listings) > limit:
+                listings = listings[:limit]
+                response.headers["X-Next-Cursor"] = encode_cursor(
+                    "distance", listings[-1]["distance_m"], listings[-1]["id"]
+                )
+            return [Listing(**listing) for listing in listings]
+    
+    # Standard search without radius
+    if city and city_key_filter(city):
+        query["city_key"] = city_key_filter(city)
+    if cursor:
+        # Newest first: continue strictly after the last (created_at, id)
+        last_created_at, last_id = decode_cursor(cursor, "created_at")
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": last_created_at}},
+            {"created_at": last_created_at, "id": {"$lt": last_id}}
+        ]}]}
+    
+    listings = await db.listings.find(query, {"_id": 0, "location": 0}).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    if len(listings) > limit:
+        listings = listings[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("created_at", listings[-1]["created_at"], listings[-1]["id"])
     return [Listing(**listing) for listing in listings]
 
+# Facet buckets: (lower bound, upper bound) pairs, the last one open-ended
+RENT_BUCKETS = [0, 500, 1000, 1500, 2000, 3000]
+SIZE_BUCKETS = [0, 20, 40, 60, 100, 200]
+
+# Facet counts per normalized filter set, shared by every user for a short time
+FACETS_CACHE = TTLCache(max_size=1000, ttl=float(os.environ.get('FACETS_CACHE_TTL', 30)))
+
+def bucket_facet(field: str, boundaries: List[int]) -> list:
+    return [{"$bucket": {
+        "groupBy": f"${field}",
+        "boundaries": boundaries,
+        "default": "above",
+        "output": {"count": {"$sum": 1}}
+    }}]
+
+def bucket_counts(rows: List[dict], boundaries: List[int]) -> List[dict]:
+    counts = {row["_id"]: row["count"] for row in rows}
+    buckets = [
+        {"min": low, "max": high, "count": counts.get(low, 0)}
+        for low, high in zip(boundaries, boundaries[1:])
+    ]
+    buckets.append({"min": boundaries[-1], "max": None, "count": counts.get("above", 0)})
+    return buckets
+
+@api_router.get("/listings/facets")
+async def get_listing_facets(
+    city: Optional[str] = None,
+    structure_type: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_rent: Optional[int] = None,
+    profession: Optional[str] = None,
+    radius: Optional[int] = None,
+    has_parking: Optional[bool] = None,
+    is_pmr_accessible: Optional[bool] = None,
+    equipments: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """Counts per structure type, equipment, parking/PMR and rent/size bucket for a search, in one $facet pass"""
+    required_equips = tuple(sorted(e.strip() for e in equipments.split(","))) if equipments else ()
+    cache_key = (
+        normalize_city(city) if city else None, radius if radius and radius > 0 else None,
+        structure_type, min_size, max_rent, profession.lower() if profession else None,
+        has_parking, is_pmr_accessible, required_equips, " ".join(q.lower().split()) if q else None
+    )
+    facets = FACETS_CACHE.get(cache_key)
+    if facets is not None:
+        return facets
+    
+    query = build_listing_filters(
+        structure_type=structure_type,
+        min_size=min_size,
+        max_rent=max_rent,
+        profession=profession,
+        has_parking=has_parking,
+        is_pmr_accessible=is_pmr_accessible,
+        equipments=equipments
+    )
+    # Same candidate set as get_listings
+    center_coords = get_city_coordinates(city) if city and radius and radius > 0 else None
+    if q and q.strip():
+        pipeline = [{"$match": text_search_match(q, query, city, center_coords, radius)}]
+    elif center_coords:
+        pipeline = [geo_near_stage(center_coords, radius, query)]
+    else:
+        if city and city_key_filter(city):
+            query["city_key"] = city_key_filter(city)
+        pipeline = [{"$match": query}]
+    
+    pipeline.append({"$facet": {
+        "total": [{"$count": "count"}],
+        "structure_type": [{"$sortByCount": "$structure_type"}],
+        "equipments": [
+            {"$unwind": "$equipments"},
+            {"$match": {"equipments": {"$in": EQUIPMENT_OPTIONS}}},
+            {"$sortByCount": "$equipments"}
+        ],
+        "flags": [{"$group": {
+            "_id": None,
+            "has_parking": {"$sum": {"$cond": [{"$eq": ["$has_parking", True]}, 1, 0]}},
+            "is_pmr_accessible": {"$sum": {"$cond": [{"$eq": ["$is_pmr_accessible", True]}, 1, 0]}}
+        }}],
+        "monthly_rent": bucket_facet("monthly_rent", RENT_BUCKETS),
+        "size": bucket_facet("size", SIZE_BUCKETS)
+    }})
+    result = (await db.listings.aggregate(pipeline).to_list(1))[0]
+    
+    flags = result["flags"][0] if result["flags"] else {"has_parking": 0, "is_pmr_accessible": 0}
+    equipment_counts = {row["_id"]: row["count"] for row in result["equipments"]}
+    facets = {
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "structure_type": {row["_id"]: row["count"] for row in result["structure_type"]},
+        "equipments": {equipment: equipment_counts.get(equipment, 0) for equipment in EQUIPMENT_OPTIONS},
+        "has_parking": flags["has_parking"],
+        "is_pmr_accessible": flags["is_pmr_accessible"],
+        "monthly_rent": bucket_counts(result["monthly_rent"], RENT_BUCKETS),
+        "size": bucket_counts(result["size"], SIZE_BUCKETS)
+    }
+    FACETS_CACHE.set(cache_key, facets)
+    return facets
+
 @api_router.get("/listings/{listing_id}", response_model=Listing)
 async def get_listing(listing_id: str):
     listing = await db.listings.find_one({"id": listing_id}, {"_id": 0})
@@ -617,11 +902,66 @@ async def get_listing(listing_id: str):
         raise HTTPException(status_code=404, detail="Listing not found")
     return Listing(**listing)
 
+# Listing ids known to exist, so that view tracking skips the find_one.
+# Emptied when the listings version changes, since another worker may have
+# deleted one of them (it refills on demand).
+KNOWN_LISTING_IDS = set()
+known_listing_ids_version = None
+
+async def is_known_listing(listing_id: str) -> bool:
+    global known_listing_ids_version
+    version = await get_listings_version()
+    if version != known_listing_ids_version:
+        KNOWN_LISTING_IDS.clear()
+        known_listing_ids_version = version
+    if listing_id in KNOWN_LISTING_IDS:
+        return True
+    # Created by another worker since startup
+    if await db.listings.find_one({"id": listing_id}, {"_id": 0, "id": 1}):
+        KNOWN_LISTING_IDS.add(listing_id)
+        return True
+    return False
+
+async def persist_listing_views(views: List[dict]):
+    """Write a batch of buffered views and bump the matching counters"""
+    # Listings deleted while their views were buffered: drop the views rather
+    # than re-create counters for them
+    listing_ids = list({view["listing_id"] for view in views})
+    existing = {doc["id"] async for doc in db.listings.find({"id": {"$in": listing_ids}}, {"_id": 0, "id": 1})}
+    if len(existing) < len(listing_ids):
+        KNOWN_LISTING_IDS.difference_update(set(listing_ids) - existing)
+        views = [view for view in views if view["listing_id"] in existing]
+        if not views:
+            return
+    await db.listing_views.insert_many(views, ordered=False)
+    per_listing = {}
+    per_day = {}
+    for view in views:
+        per_listing[view["listing_id"]] = per_listing.get(view["listing_id"], 0) + 1
+        key = (view["listing_id"], view["timestamp"][:10])
+        per_day[key] = per_day.get(key, 0) + 1
+    await asyncio.gather(
+        db.listing_counters.bulk_write([
+            UpdateOne({"listing_id": lid}, {"$inc": {"views": count}}, upsert=True)
+            for lid, count in per_listing.items()
+        ], ordered=False),
+        db.listing_views_daily.bulk_write([
+            UpdateOne({"listing_id": lid, "day": day}, {"$inc": {"views": count}}, upsert=True)
+            for (lid, day), count in per_day.items()
+        ], ordered=False)
+    )
+
+VIEW_BUFFER = ViewBuffer(
+    persist_listing_views,
+    max_size=int(os.environ.get('VIEW_BUFFER_MAX_SIZE', 10000)),
+    flush_size=int(os.environ.get('VIEW_BUFFER_FLUSH_SIZE', 500)),
+    flush_interval=float(os.environ.get('VIEW_BUFFER_FLUSH_INTERVAL', 2.0))
+)
+
 @api_router.post("/listings/{listing_id}/view")
 async def track_listing_view(listing_id: str, user_id: Optional[str] = None):
-    """Track a view on a listing for statistics"""
-    listing = await db.listings.find_one({"id": listing_id}, {"_id": 0})
-    if not listing:
+    """Track a view on a listing for statistics (buffered, written in batches)"""
+    if not await is_known_listing(listing_id):
         raise HTTPException(status_code=404, detail="Listing not found")
     
     view_doc = {
@@ -630,7 +970,8 @@ async def track_listing_view(listing_id: str, user_id: Optional[str] = None):
         "user_id": user_id,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
-    await db.listing_views.insert_one(view_doc)
+    if not VIEW_BUFFER.add(view_doc):
+        return {"message": "View dropped"}
     return {"message": "View tracked"}
 
 @api_router.put("/listings/{listing_id}", response_model=Listing)
@@ -645,10 +986,17 @@ async def update_listing(
     if listing["owner_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    update_data = listing_data.model_dump()
-    await db.listings.update_one({"id": listing_id}, {"$set": update_data})
+    update_data = {**listing_data.model_dump(), "city_key": normalize_city(listing_data.city)}
+    location = listing_location(listing_data.city)
+    if location:
+        update = {"$set": {**update_data, "location": location}}
+    else:
+        update = {"$set": update_data, "$unset": {"location": ""}}
+    await db.listings.update_one({"id": listing_id}, update)
+    await bump_listings_version()
     
     updated_listing = await db.listings.find_one({"id": listing_id}, {"_id": 0})
+    await percolate_listing(updated_listing)
     return Listing(**updated_listing)
 
 @api_router.delete("/listings/{listing_id}")
@@ -660,6 +1008,11 @@ async def delete_listing(listing_id: str, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.listings.delete_one({"id": listing_id})
+    KNOWN_LISTING_IDS.discard(listing_id)
+    await bump_listings_version()
+    await db.listing_counters.delete_one({"listing_id": listing_id})
+    await db.listing_views_daily.delete_many({"listing_id": listing_id})
+    await db.alert_hits.delete_many({"listing_id": listing_id})
     return {"message": "Listing deleted"}
 
 # Favorites routes
@@ -680,7 +1033,11 @@ async def add_favorite(favorite_data: FavoriteCreate, current_user: dict = Depen
         "listing_id": favorite_data.listing_id,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.favorites.insert_one(favorite_doc)
+    try:
+        await db.favorites.insert_one(favorite_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Already in favorites")
+    await bump_listing_counters(favorite_data.listing_id, favorites=1)
     
     return Favorite(**favorite_doc)
 
@@ -697,10 +1054,126 @@ async def remove_favorite(listing_id: str, current_user: dict = Depends(get_curr
     })
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Favorite not found")
+    await bump_listing_counters(listing_id, favorites=-1)
     return {"message": "Favorite removed"}
 
 # ==================== OWNER STATISTICS ROUTES ====================
 
+LISTING_COUNTER_FIELDS = ("views", "favorites", "contacts", "applications", "visits")
+
+async def bump_listing_counters(listing_id: str, **increments: int):
+    """Atomically $inc the engagement counters of a listing (views=1, favorites=-1...)"""
+    await db.listing_counters.update_one(
+        {"listing_id": listing_id},
+        {"$inc": increments},
+        upsert=True
+    )
+
+async def get_listing_counters(listing_ids: List[str]) -> dict:
+    """Engagement counters for each listing, zero for listings without any event yet"""
+    counters = {lid: {field: 0 for field in LISTING_COUNTER_FIELDS} for lid in listing_ids}
+    async for doc in db.listing_counters.find({"listing_id": {"$in": listing_ids}}, {"_id": 0}):
+        counters[doc["listing_id"]].update({f: doc.get(f, 0) for f in LISTING_COUNTER_FIELDS})
+    return counters
+
+async def rebuild_listing_counters(dry_run: bool = False) -> List[dict]:
+    """
+    Recount every listing's counters from the raw event collections
+    Returns the drift found: [{"listing_id", "field", "counter", "actual"}]
+    """
+    owners = {}
+    async for listing in db.listings.find({}, {"_id": 0, "id": 1, "owner_id": 1}):
+        owners[listing["id"]] = listing["owner_id"]
+    listing_ids = list(owners)
+    
+    views, favorites, applications, visits = await asyncio.gather(
+        count_per_listing(db.listing_views, {"listing_id": {"$in": listing_ids}}),
+        count_per_listing(db.favorites, {"listing_id": {"$in": listing_ids}}),
+        count_per_listing(db.applications, {"listing_id": {"$in": listing_ids}}),
+        count_per_listing(db.visits, {"listing_id": {"$in": listing_ids}})
+    )
+    # Contacts are messages sent to the listing's owner about that listing
+    contacts = {}
+    pipeline = [
+        {"$match": {"listing_id": {"$in": listing_ids}}},
+        {"$group": {"_id": {"listing_id": "$listing_id", "receiver_id": "$receiver_id"}, "total": {"$sum": 1}}}
+    ]
+    async for row in db.messages.aggregate(pipeline):
+        lid = row["_id"]["listing_id"]
+        if owners[lid] == row["_id"]["receiver_id"]:
+            contacts[lid] = {"total": row["total"]}
+    
+    stored = await get_listing_counters(listing_ids)
+    sources = {"views": views, "favorites": favorites, "contacts": contacts,
+               "applications": applications, "visits": visits}
+    drift = []
+    for lid in listing_ids:
+        actual = {field: counts.get(lid, {"total": 0})["total"] for field, counts in sources.items()}
+        for field, value in actual.items():
+            if stored[lid][field] != value:
+                drift.append({"listing_id": lid, "field": field, "counter": stored[lid][field], "actual": value})
+        if not dry_run and actual != stored[lid]:
+            await db.listing_counters.update_one({"listing_id": lid}, {"$set": actual}, upsert=True)
+    if not dry_run:
+        await db.listing_counters.delete_many({"listing_id": {"$nin": listing_ids}})
+    return drift
+
+def days_ago(days: int) -> str:
+    """Calendar day (YYYY-MM-DD, UTC) of the daily view buckets"""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+
+async def sum_daily_views(listing_ids: List[str], windows: dict) -> dict:
+    """
+    Views per listing from the listing_views_daily buckets
+    windows maps a bucket name to its first day (YYYY-MM-DD).
+    Returns: {listing_id: {<bucket>: n, ...}}
+    """
+    group = {"_id": "$listing_id"}
+    for name, since in windows.items():
+        group[name] = {"$sum": {"$cond": [{"$gte": ["$day", since]}, "$views", 0]}}
+    pipeline = [
+        {"$match": {"listing_id": {"$in": listing_ids}, "day": {"$gte": min(windows.values())}}},
+        {"$group": group}
+    ]
+    totals = {}
+    async for row in db.listing_views_daily.aggregate(pipeline):
+        totals[row.pop("_id")] = row
+    return totals
+
+async def backfill_daily_views():
+    """Rebuild the listing_views_daily buckets from the raw listing_views collection"""
+    await db.listing_views.aggregate([
+        {"$group": {
+            "_id": {"listing_id": "$listing_id", "day": {"$substrBytes": ["$timestamp", 0, 10]}},
+            "views": {"$sum": 1}
+        }},
+        {"$project": {"_id": 0, "listing_id": "$_id.listing_id", "day": "$_id.day", "views": 1}},
+        {"$merge": {
+            "into": "listing_views_daily",
+            "on": ["listing_id", "day"],
+            "whenMatched": [{"$set": {"views": "$$new.views"}}],
+            "whenNotMatched": "insert"
+        }}
+    ]).to_list(None)
+    return await db.listing_views_daily.count_documents({})
+
+async def count_per_listing(collection, match: dict, date_field: Optional[str] = None, windows: Optional[dict] = None) -> dict:
+    """
+    Count documents per listing_id in a single $group pass
+    windows maps a bucket name to an ISO date: documents with date_field >= that date
+    are also counted in the bucket.
+    Returns: {listing_id: {"total": n, <bucket>: n, ...}}
+    """
+    windows = windows or {}
+    group = {"_id": "$listing_id", "total": {"$sum": 1}}
+    for name, since in windows.items():
+        group[name] = {"$sum": {"$cond": [{"$gte": [f"${date_field}", since]}, 1, 0]}}
+    
+    counts = {}
+    async for row in collection.aggregate([{"$match": match}, {"$group": group}]):
+        counts[row.pop("_id")] = row
+    return counts
+
 @api_router.get("/owner/stats")
 async def get_owner_statistics(current_user: dict = Depends(get_current_user)):
     """Get overall statistics for a property owner"""
@@ -710,55 +1183,37 @@ async def get_owner_statistics(current_user: dict = Depends(get_current_user)):
     owner_id = current_user["id"]
     
     # Get owner's listings
-    listings = await db.listings.find({"owner_id": owner_id}, {"_id": 0}).to_list(50)
+    listings = await db.listings.find(
+        {"owner_id": owner_id},
+        {"_id": 0, "id": 1, "title": 1, "city": 1, "monthly_rent": 1, "created_at": 1}
+    ).to_list(None)
     listing_ids = [l["id"] for l in listings]
     
-    # Calculate stats
-    total_views = await db.listing_views.count_documents({"listing_id": {"$in": listing_ids}})
-    
-    # Messages received (as owner)
-    total_contacts = await db.messages.count_documents({"receiver_id": owner_id})
+    thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
     
-    # Favorites on owner's listings
-    total_favorites = await db.favorites.count_documents({"listing_id": {"$in": listing_ids}})
+    # Totals come from the maintained counters, view windows from the daily
+    # buckets; only recent contacts are counted from raw messages
+    counters, recent_views, recent_contacts = await asyncio.gather(
+        get_listing_counters(listing_ids),
+        sum_daily_views(listing_ids, {"7d": days_ago(6), "30d": days_ago(29)}),
+        count_per_listing(db.messages, {
+            "receiver_id": owner_id,
+            "listing_id": {"$in": listing_ids},
+            "created_at": {"$gte": thirty_days_ago}
+        })
+    )
     
-    # Applications received
-    total_applications = await db.applications.count_documents({"listing_id": {"$in": listing_ids}})
+    def total(counts: dict, field: str) -> int:
+        return sum(c[field] for c in counts.values())
     
-    # Visits scheduled
-    total_visits = await db.visits.count_documents({"listing_id": {"$in": listing_ids}})
-    
-    # Last 30 days stats
-    thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-    views_30d = await db.listing_views.count_documents({
-        "listing_id": {"$in": listing_ids},
-        "timestamp": {"$gte": thirty_days_ago}
-    })
-    contacts_30d = await db.messages.count_documents({
-        "receiver_id": owner_id,
-        "created_at": {"$gte": thirty_days_ago}
-    })
+    total_views = total(counters, "views")
+    total_contacts = total(counters, "contacts")
     
     # Per listing stats
+    empty = {"7d": 0, "30d": 0}
     listings_stats = []
     for listing in listings:
         lid = listing["id"]
-        listing_views = await db.listing_views.count_documents({"listing_id": lid})
-        listing_favorites = await db.favorites.count_documents({"listing_id": lid})
-        listing_contacts = await db.messages.count_documents({
-            "receiver_id": owner_id,
-            "listing_id": lid
-        })
-        listing_applications = await db.applications.count_documents({"listing_id": lid})
-        listing_visits = await db.visits.count_documents({"listing_id": lid})
-        
-        # Views in last 7 days
-        seven_days_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-        views_7d = await db.listing_views.count_documents({
-            "listing_id": lid,
-            "timestamp": {"$gte": seven_days_ago}
-        })
-        
         listings_stats.append({
             "listing_id": lid,
             "title": listing.get("title", ""),
@@ -766,12 +1221,12 @@ async def get_owner_statistics(current_user: dict = Depends(get_current_user)):
             "monthly_rent": listing.get("monthly_rent", 0),
             "created_at": listing.get("created_at", ""),
             "stats": {
-                "total_views": listing_views,
-                "views_7d": views_7d,
-                "favorites": listing_favorites,
-                "contacts": listing_contacts,
-                "applications": listing_applications,
-                "visits_scheduled": listing_visits
+                "total_views": counters[lid]["views"],
+                "views_7d": recent_views.get(lid, empty)["7d"],
+                "favorites": counters[lid]["favorites"],
+                "contacts": counters[lid]["contacts"],
+                "applications": counters[lid]["applications"],
+                "visits_scheduled": counters[lid]["visits"]
             }
         })
     
@@ -780,11 +1235,11 @@ async def get_owner_statistics(current_user: dict = Depends(get_current_user)):
             "total_listings": len(listings),
             "total_views": total_views,
             "total_contacts": total_contacts,
-            "total_favorites": total_favorites,
-            "total_applications": total_applications,
-            "total_visits": total_visits,
-            "views_30d": views_30d,
-            "contacts_30d": contacts_30d,
+            "total_favorites": total(counters, "favorites"),
+            "total_applications": total(counters, "applications"),
+            "total_visits": total(counters, "visits"),
+            "views_30d": total(recent_views, "30d"),
+            "contacts_30d": total(recent_contacts, "total"),
             "conversion_rate": round((total_contacts / total_views * 100), 1) if total_views > 0 else 0
         },
         "listings": listings_stats
@@ -802,34 +1257,32 @@ async def get_listing_statistics(listing_id: str, current_user: dict = Depends(g
     if listing["owner_id"] != current_user["id"]:
         raise HTTPException(status_code=403, detail="Not your listing")
     
-    owner_id = current_user["id"]
-    
-    # Get all views for this listing
-    views = await db.listing_views.find({"listing_id": listing_id}, {"_id": 0}).sort("timestamp", -1).to_list(1000)
-    
-    # Calculate daily views for last 30 days
-    daily_views = {}
-    for i in range(30):
-        day = (datetime.now(timezone.utc) - timedelta(days=i)).strftime("%Y-%m-%d")
-        daily_views[day] = 0
-    
-    for view in views:
-        day = view["timestamp"][:10]
-        if day in daily_views:
-            daily_views[day] += 1
+    # Daily views for the last 30 days, from at most 30 bucket documents
+    daily_views = {days_ago(i): 0 for i in range(30)}
+    buckets = db.listing_views_daily.find(
+        {"listing_id": listing_id, "day": {"$gte": days_ago(29)}},
+        {"_id": 0, "day": 1, "views": 1}
+    )
+    async for bucket in buckets:
+        if bucket["day"] in daily_views:
+            daily_views[bucket["day"]] = bucket["views"]
     
     # Sort by date
     views_chart = [{"date": k, "views": v} for k, v in sorted(daily_views.items())]
     
     # Other stats
-    total_views = len(views)
-    favorites = await db.favorites.count_documents({"listing_id": listing_id})
-    contacts = await db.messages.count_documents({"receiver_id": owner_id, "listing_id": listing_id})
-    applications = await db.applications.count_documents({"listing_id": listing_id})
-    visits = await db.visits.count_documents({"listing_id": listing_id})
+    counters = (await get_listing_counters([listing_id]))[listing_id]
+    total_views = counters["views"]
+    favorites = counters["favorites"]
+    contacts = counters["contacts"]
+    applications = counters["applications"]
+    visits = counters["visits"]
     
     # Calculate averages in the area (simple estimation)
-    city_listings = await db.listings.find({"city": listing["city"]}, {"_id": 0}).to_list(50)
+    city_listings = await db.listings.find(
+        {"city_key": normalize_city(listing["city"])},
+        {"_id": 0, "monthly_rent": 1}
+    ).to_list(50)
     avg_rent = sum([l.get("monthly_rent", 0) for l in city_listings]) / len(city_listings) if city_listings else 0
     
     return {
@@ -855,30 +1308,88 @@ async def get_listing_statistics(listing_id: str, current_user: dict = Depends(g
     }
 
 # Matching routes
+
+# Columnar snapshot of all listings for vectorized scoring. When the listings
+# version changes it is rebuilt in the background while requests keep scoring
+# against the previous one, so writes never stall /matches.
+match_snapshot: Optional[MatchSnapshot] = None
+match_snapshot_version = -1
+match_snapshot_task: Optional[asyncio.Task] = None
+
+# Match pages per (user, profile fingerprint, page), valid for one snapshot version
+MATCH_CACHE = TTLCache(
+    max_size=int(os.environ.get('MATCH_CACHE_SIZE', 5000)),
+    ttl=float(os.environ.get('MATCH_CACHE_TTL', 600))
+)
+match_cache_version = -1
+MATCH_PROFILE_FIELDS = ("preferred_city", "max_budget", "min_size", "preferred_structure_type", "profession")
+
+async def build_match_snapshot(version: int):
+    global match_snapshot, match_snapshot_version
+    # Scored fields only: the page's full listings are loaded by id afterwards
+    listings = await db.listings.find({}, {"_id": 0, **{field: 1 for field in SCORED_FIELDS}}).to_list(None)
+    # Building the columns takes hundreds of ms at 100k listings: off the event loop
+    match_snapshot = await asyncio.to_thread(MatchSnapshot, listings)
+    match_snapshot_version = version
+
+def log_match_snapshot_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Match snapshot rebuild failed", exc_info=task.exception())
+
+async def get_match_snapshot(version: int) -> tuple:
+    """
+    Latest built snapshot and its version
+    An outdated snapshot is returned as is while one rebuild runs in the
+    background; only the first request of a worker waits for a build.
+    """
+    global match_snapshot_task
+    if match_snapshot_version != version and (match_snapshot_task is None or match_snapshot_task.done()):
+        match_snapshot_task = asyncio.create_task(build_match_snapshot(version))
+        match_snapshot_task.add_done_callback(log_match_snapshot_failure)
+    if match_snapshot is None:
+        await asyncio.shield(match_snapshot_task)
+    return match_snapshot, match_snapshot_version
+
+async def find_matches(user: dict, limit: int, skip: int = 0) -> List[MatchResult]:
+    """Score every listing for the user and explain only the selected page"""
+    global match_cache_version
+    snapshot, version = await get_match_snapshot(await get_listings_version())
+    if version != match_cache_version:
+        # A rebuilt snapshot reflects listing writes: every cached page is stale
+        MATCH_CACHE.clear()
+        match_cache_version = version
+    
+    # A preference change gives a new fingerprint, hence a new cache entry
+    fingerprint = tuple(user.get(field) for field in MATCH_PROFILE_FIELDS)
+    key = (user["id"], fingerprint, skip, limit)
+    matches = MATCH_CACHE.get(key)
+    if matches is not None:
+        return matches
+    
+    top = [(snapshot.ids[index], score) for index, score in snapshot.top(user, limit=limit, offset=skip)]
+    listings = {
+        listing["id"]: listing
+        async for listing in db.listings.find(
+            {"id": {"$in": [listing_id for listing_id, _ in top]}}, {"_id": 0, "location": 0}
+        )
+    }
+    matches = []
+    for listing_id, score in top:
+        # Deleted since the snapshot was built
+        if listing_id not in listings:
+            continue
+        _, reasons = calculate_match_score(user, listings[listing_id])
+        matches.append(MatchResult(listing=Listing(**listings[listing_id]), score=score, reasons=reasons))
+    MATCH_CACHE.set(key, matches)
+    return matches
+
 @api_router.get("/matches", response_model=List[MatchResult])
-async def get_matches(current_user: dict = Depends(get_current_user)):
+async def get_matches(skip: int = 0, limit: int = 100, current_user: dict = Depends(get_current_user)):
     """Get recommended listings based on user profile with compatibility scores"""
     if current_user.get("user_type") != "locataire":
         raise HTTPException(status_code=403, detail="Only practitioners can access matches")
     
-    # Get all active listings
-    listings = await db.listings.find({}, {"_id": 0}).to_list(100)
-    
-    # Calculate scores for each listing
-    matches = []
-    for listing in listings:
-        score, reasons = calculate_match_score(current_user, listing)
-        if score > 0:  # Only include listings with some match
-            matches.append({
-                "listing": Listing(**listing),
-                "score": score,
-                "reasons": reasons
-            })
-    
-    # Sort by score descending
-    matches.sort(key=lambda x: x["score"], reverse=True)
-    
-    return [MatchResult(**match) for match in matches]
+    return await find_matches(current_user, limit=max(limit, 0), skip=max(skip, 0))
 
 @api_router.get("/matches/top")
 async def get_top_matches(limit: int = 3, current_user: dict = Depends(get_current_user)):
@@ -886,21 +1397,7 @@ async def get_top_matches(limit: int = 3, current_user: dict = Depends(get_curre
     if current_user.get("user_type") != "locataire":
         raise HTTPException(status_code=403, detail="Only practitioners can access matches")
     
-    listings = await db.listings.find({}, {"_id": 0}).to_list(100)
-    
-    matches = []
-    for listing in listings:
-        score, reasons = calculate_match_score(current_user, listing)
-        if score > 0:
-            matches.append({
-                "listing": Listing(**listing),
-                "score": score,
-                "reasons": reasons
-            })
-    
-    matches.sort(key=lambda x: x["score"], reverse=True)
-    
-    return [MatchResult(**match) for match in matches[:limit]]
+    return await find_matches(current_user, limit=max(limit, 0))
 
 # ==================== LISTING PHOTO UPLOAD ====================
 
@@ -908,34 +1405,38 @@ async def get_top_matches(limit: int = 3, current_user: dict = Depends(get_curre
 LISTING_PHOTOS_DIR = ROOT_DIR / "listing_photos"
 LISTING_PHOTOS_DIR.mkdir(exist_ok=True)
 
+# Thumbnail / card / full variants, generated in IMAGE_WORKERS processes
+IMAGE_PIPELINE = ImagePipeline(workers=int(os.environ.get('IMAGE_WORKERS', 2)))
+
+# Photos are named after the SHA-256 of their content: their URL never serves
+# other bytes, so browsers may cache them for good. Photos uploaded before
+# (uuid names) are revalidated after PHOTO_CACHE_MAX_AGE seconds.
+CONTENT_ADDRESSED = re.compile(r"[0-9a-f]{64}")
+PHOTO_CACHE_MAX_AGE = int(os.environ.get('PHOTO_CACHE_MAX_AGE', 3600))
+
 @api_router.post("/listings/upload-photo")
 async def upload_listing_photo(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload a photo for a listing"""
+    """Upload a photo for a listing (multipart field "file")"""
     if current_user.get("user_type") != "proprietaire":
         raise HTTPException(status_code=403, detail="Only owners can upload listing photos")
     
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Type de fichier non autorisé. JPEG, PNG, WebP uniquement.")
-    
-    # Validate file size (max 5MB)
-    content = await file.read()
-    if len(content) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 5MB)")
-    
-    # Generate unique filename
-    photo_id = str(uuid.uuid4())
-    extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    new_filename = f"{photo_id}.{extension}"
-    file_path = LISTING_PHOTOS_DIR / new_filename
+    # Type (sniffed from the content) and size (max 5MB) are checked while streaming
+    upload = await receive_file(
+        request, LISTING_PHOTOS_DIR, 5 * 1024 * 1024, {"image/jpeg", "image/png", "image/webp"},
+        type_error="Type de fichier non autorisé. JPEG, PNG, WebP uniquement."
+    )
     
-    # Save file
-    async with aiofiles.open(file_path, "wb") as f:
-        await f.write(content)
+    # Content-addressed filename: the same photo uploaded twice is stored once
+    photo_id = upload.sha256
+    new_filename = f"{photo_id}.{upload.extension}"
+    if (LISTING_PHOTOS_DIR / new_filename).exists():
+        upload.discard()
+    else:
+        upload.move_to(LISTING_PHOTOS_DIR / new_filename)
+        IMAGE_PIPELINE.submit(LISTING_PHOTOS_DIR / new_filename)
     
     # Return the URL
     photo_url = f"/api/listing-photos/{new_filename}"
@@ -944,18 +1445,36 @@ async def upload_listing_photo(
         "id": photo_id,
         "filename": new_filename,
         "url": photo_url,
-        "size": len(content)
+        "size": upload.size,
+        "sha256": upload.sha256
     }
 
 @api_router.get("/listing-photos/{filename}")
-async def get_listing_photo(filename: str):
-    """Serve a listing photo"""
+async def get_listing_photo(filename: str, request: Request, size: Optional[str] = None):
+    """Serve a listing photo; size=thumb|card|full serves a resized WebP/JPEG variant when generated"""
     file_path = LISTING_PHOTOS_DIR / filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Photo non trouvée")
     
+    if CONTENT_ADDRESSED.fullmatch(file_path.name.split(".")[0]):
+        # The file name (digest, variant, format) identifies the bytes
+        etag, cache_control = f'"{file_path.name}"', IMMUTABLE
+    else:
+        etag, cache_control = None, f"public, max-age={PHOTO_CACHE_MAX_AGE}"
+    if size is not None:
+        if size not in VARIANTS:
+            raise HTTPException(status_code=400, detail=f"size must be one of: {', '.join(VARIANTS)}")
+        variant = best_variant(file_path, size, "image/webp" in request.headers.get("accept", ""))
+        if variant is not None:
+            file_path = variant
+            if etag:
+                etag = f'"{file_path.name}"'
+        else:
+            # Variants not generated yet: the original, until they are
+            cache_control = "public, max-age=60"
+    
     # Determine content type
-    extension = filename.split(".")[-1].lower()
+    extension = file_path.name.split(".")[-1].lower()
     content_types = {
         "jpg": "image/jpeg",
         "jpeg": "image/jpeg",
@@ -964,12 +1483,147 @@ async def get_listing_photo(filename: str):
     }
     content_type = content_types.get(extension, "image/jpeg")
     
-    return FileResponse(
-        path=file_path,
-        media_type=content_type
+    return serve_file(
+        request,
+        file_path,
+        media_type=content_type,
+        etag=etag,
+        cache_control=cache_control,
+        headers={"Vary": "Accept"} if size is not None else None
     )
 
+async def generate_missing_photo_variants() -> int:
+    """Generate the variants of photos uploaded before the pipeline (or whose generation failed)"""
+    generated = 0
+    for original in sorted(LISTING_PHOTOS_DIR.iterdir()):
+        if original.name.startswith(".") or is_variant(original):
+            continue
+        if all(variant_path(original, variant, fmt).exists() for variant in VARIANTS for fmt in FORMATS):
+            continue
+        if await IMAGE_PIPELINE.generate(original):
+            generated += 1
+    return generated
+
 # Alert routes
+
+# Active alerts compiled into a reverse index, matched against every listing
+# write; rebuilt when the "alerts" version changes (on any worker)
+alert_index = {"version": None, "index": AlertIndex(get_city_coordinates)}
+
+async def get_alert_index() -> AlertIndex:
+    version = await get_version("alerts")
+    if alert_index["version"] != version:
+        index = AlertIndex(get_city_coordinates)
+        async for alert in db.alerts.find({"active": True}, {"_id": 0}):
+            index.add(alert)
+        alert_index.update(version=version, index=index)
+    return alert_index["index"]
+
+async def record_alert_hits(listing: dict, alerts: list):
+    """Upsert the listing's hits; alerts gaining a new hit get their new_count bumped"""
+    if not alerts:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    result = await db.alert_hits.bulk_write([
+        UpdateOne(
+            {"alert_id": alert.id, "listing_id": listing["id"]},
+            {"$setOnInsert": {
+                "user_id": alert.user_id,
+                "listing_created_at": listing.get("created_at", ""),
+                "matched_at": now
+            }},
+            upsert=True
+        )
+        for alert in alerts
+    ], ordered=False)
+    new_hits = [alerts[i].id for i in result.upserted_ids]
+    if new_hits:
+        await db.alerts.update_many({"id": {"$in": new_hits}}, {"$inc": {"new_count": 1}})
+
+async def percolate_listing(listing: dict, is_new: bool = False) -> int:
+    """
+    Record the listing as a hit of every alert it matches (alerts created
+    before the listing, as before); hits it no longer matches are removed
+    Returns the number of matching alerts
+    """
+    index = await get_alert_index()
+    created_at = listing.get("created_at", "")
+    matches = [alert for alert in index.match(listing) if alert.created_at < created_at]
+    if not is_new:
+        await db.alert_hits.delete_many({
+            "listing_id": listing["id"],
+            "alert_id": {"$nin": [alert.id for alert in matches]}
+        })
+    await record_alert_hits(listing, matches)
+    return len(matches)
+
+# Safety net for hits missed at write time (alert index not yet refreshed on
+# that worker, alert inactive at the time): every ALERT_CHECK_INTERVAL seconds,
+# active alerts are matched, ALERT_CHECK_BATCH at a time, against the listings
+# created since their last_checked watermark.
+ALERT_CHECK_INTERVAL = float(os.environ.get('ALERT_CHECK_INTERVAL', 300))
+ALERT_CHECK_BATCH = int(os.environ.get('ALERT_CHECK_BATCH', 500))
+# Listings younger than this may still be in flight; they are left to the next pass
+ALERT_CHECK_LAG = timedelta(seconds=60)
+ALERT_CHECK_TASK = None
+
+async def check_alerts_incrementally() -> int:
+    """Match active alerts against listings created since their watermark; returns the hits found"""
+    until = (datetime.now(timezone.utc) - ALERT_CHECK_LAG).isoformat()
+    found = 0
+    last_id = ""
+    while True:
+        batch = await db.alerts.find(
+            {"active": True, "id": {"$gt": last_id}}, {"_id": 0}
+        ).sort("id", 1).limit(ALERT_CHECK_BATCH).to_list(ALERT_CHECK_BATCH)
+        if not batch:
+            return found
+        last_id = batch[-1]["id"]
+        
+        index = AlertIndex(get_city_coordinates)
+        watermarks = {}
+        for alert in batch:
+            index.add(alert)
+            watermarks[alert["id"]] = max(alert.get("last_checked") or "", alert["created_at"])
+        # One scan of the created_at index per batch, from the oldest watermark
+        since = min(watermarks.values())
+        if since < until:
+            async for listing in db.listings.find({"created_at": {"$gt": since, "$lte": until}}, {"_id": 0}):
+                matches = [alert for alert in index.match(listing) if watermarks[alert.id] < listing["created_at"]]
+                await record_alert_hits(listing, matches)
+                found += len(matches)
+        
+        # Advance each watermark only if no other pass moved it meanwhile
+        advances = [
+            UpdateOne(
+                {"id": alert["id"], "last_checked": alert.get("last_checked")},
+                {"$set": {"last_checked": until}}
+            )
+            for alert in batch
+            if (alert.get("last_checked") or "") < until
+        ]
+        if advances:
+            await db.alerts.bulk_write(advances, ordered=False)
+
+async def check_alerts_periodically():
+    while True:
+        try:
+            # Slightly longer than the interval, so the holder renews it before it lapses
+            if await acquire_lease("alert-check", ALERT_CHECK_INTERVAL * 1.5):
+                found = await check_alerts_incrementally()
+                if found:
+                    logger.info("Incremental alert check recorded %d hit(s)", found)
+        except Exception:
+            logger.exception("Incremental alert check failed")
+        await asyncio.sleep(ALERT_CHECK_INTERVAL)
+
+async def rebuild_alert_hits() -> int:
+    """Recompute alert_hits from every listing; returns the number of hits"""
+    await db.alert_hits.delete_many({})
+    async for listing in db.listings.find({}, {"_id": 0}):
+        await percolate_listing(listing, is_new=True)
+    return await db.alert_hits.count_documents({})
+
 @api_router.post("/alerts", response_model=Alert)
 async def create_alert(alert_data: AlertCreate, current_user: dict = Depends(get_current_user)):
     """Create a new search alert"""
@@ -982,6 +1636,7 @@ async def create_alert(alert_data: AlertCreate, current_user: dict = Depends(get
         "user_id": current_user["id"],
         "name": alert_data.name,
         "city": alert_data.city,
+        "city_key": normalize_city(alert_data.city) if alert_data.city else None,
         "radius": alert_data.radius,
         "structure_type": alert_data.structure_type,
         "profession": alert_data.profession,
@@ -989,9 +1644,11 @@ async def create_alert(alert_data: AlertCreate, current_user: dict = Depends(get
         "min_size": alert_data.min_size,
         "active": True,
         "created_at": datetime.now(timezone.utc).isoformat(),
-        "last_checked": None
+        "last_checked": None,
+        "new_count": 0
     }
     await db.alerts.insert_one(alert_doc)
+    await bump_version("alerts")
     
     return Alert(**alert_doc)
 
@@ -1005,41 +1662,49 @@ async def get_alerts(current_user: dict = Depends(get_current_user)):
     return [Alert(**alert) for alert in alerts]
 
 @api_router.get("/alerts/{alert_id}/matches")
-async def get_alert_matches(alert_id: str, current_user: dict = Depends(get_current_user)):
-    """Get new listings matching this alert"""
+async def get_alert_matches(
+    response: Response,
+    alert_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get new listings matching this alert, newest first, from the hits recorded at listing write time"""
     alert = await db.alerts.find_one({"id": alert_id, "user_id": current_user["id"]}, {"_id": 0})
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
-    
-    # Get listings created after alert creation
-    alert_created = datetime.fromisoformat(alert["created_at"])
-    
-    # Build query from alert criteria
-    query = {}
-    if alert.get("city"):
-        query["city"] = {"$regex": alert["city"], "$options": "i"}
-    if alert.get("structure_type"):
-        query["structure_type"] = alert["structure_type"]
-    if alert.get("max_rent"):
-        query["monthly_rent"] = {"$lte": alert["max_rent"]}
-    if alert.get("min_size"):
-        query["size"] = {"$gte": alert["min_size"]}
-    if alert.get("profession"):
-        query["profiles_searched"] = {"$regex": alert["profession"], "$options": "i"}
-    
-    listings = await db.listings.find(query, {"_id": 0}).to_list(100)
-    
-    # Filter listings created after alert
-    new_listings = []
-    for listing in listings:
-        listing_created = datetime.fromisoformat(listing.get("created_at", alert_created.isoformat()))
-        if listing_created > alert_created:
-            new_listings.append(listing)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    query = {"alert_id": alert_id}
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, "alert_hit")
+        query["$or"] = [
+            {"listing_created_at": {"$lt": last_created_at}},
+            {"listing_created_at": last_created_at, "listing_id": {"$lt": last_id}}
+        ]
+    hits = await db.alert_hits.find(query, {"_id": 0, "listing_id": 1, "listing_created_at": 1}).sort(
+        [("listing_created_at", -1), ("listing_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            "alert_hit", hits[-1]["listing_created_at"], hits[-1]["listing_id"]
+        )
+    
+    if not cursor and alert.get("new_count"):
+        # The first page has been seen
+        await db.alerts.update_one({"id": alert_id}, {"$set": {"new_count": 0}})
+    
+    ids = [hit["listing_id"] for hit in hits]
+    listings = {
+        listing["id"]: listing
+        async for listing in db.listings.find({"id": {"$in": ids}}, {"_id": 0})
+    }
     
     return {
         "alert": Alert(**alert),
-        "new_listings_count": len(new_listings),
-        "listings": [Listing(**l) for l in new_listings]
+        "new_listings_count": await db.alert_hits.count_documents({"alert_id": alert_id}),
+        "listings": [Listing(**listings[lid]) for lid in ids if lid in listings]
     }
 
 @api_router.put("/alerts/{alert_id}")
@@ -1051,6 +1716,7 @@ async def update_alert(alert_id: str, active: bool, current_user: dict = Depends
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await bump_version("alerts")
     
     alert = await db.alerts.find_one({"id": alert_id}, {"_id": 0})
     return Alert(**alert)
@@ -1061,6 +1727,8 @@ async def delete_alert(alert_id: str, current_user: dict = Depends(get_current_u
     result = await db.alerts.delete_one({"id": alert_id, "user_id": current_user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
+    await bump_version("alerts")
+    await db.alert_hits.delete_many({"alert_id": alert_id})
     return {"message": "Alert deleted"}
 
 # Visit routes
@@ -1091,6 +1759,7 @@ async def create_visit(visit_data: VisitCreate, current_user: dict = Depends(get
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.visits.insert_one(visit_doc)
+    await bump_listing_counters(visit_data.listing_id, visits=1)
     
     return Visit(**visit_doc)
 
@@ -1127,15 +1796,16 @@ async def update_visit_status(visit_id: str, status: str, current_user: dict = D
 @api_router.delete("/visits/{visit_id}")
 async def delete_visit(visit_id: str, current_user: dict = Depends(get_current_user)):
     """Cancel/delete a visit"""
-    result = await db.visits.delete_one({
+    visit = await db.visits.find_one_and_delete({
         "id": visit_id,
         "$or": [
             {"practitioner_id": current_user["id"]},
             {"owner_id": current_user["id"]}
         ]
-    })
-    if result.deleted_count == 0:
+    }, {"_id": 0, "listing_id": 1})
+    if visit is None:
         raise HTTPException(status_code=404, detail="Visit not found")
+    await bump_listing_counters(visit["listing_id"], visits=-1)
     return {"message": "Visit cancelled"}
 
 # Search Log Models
@@ -1174,6 +1844,7 @@ async def log_search(search_data: SearchLogCreate, current_user: dict = Depends(
         "user_name": f"{current_user['first_name']} {current_user['last_name']}",
         "user_profession": current_user["profession"],
         "city": search_data.city,
+        "city_key": normalize_city(search_data.city) if search_data.city else None,
         "radius": search_data.radius,
         "structure_type": search_data.structure_type,
         "profession": search_data.profession,
@@ -1208,49 +1879,44 @@ async def get_searches_by_city(city: str, current_user: dict = Depends(get_curre
     if current_user.get("user_type") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    logs = await db.search_logs.find({"city": {"$regex": city, "$options": "i"}}, {"_id": 0}).sort("timestamp", -1).to_list(100)
+    logs = await db.search_logs.find(
+        {"city_key": city_key_filter(city) or ""},
+        {"_id": 0}
+    ).sort("timestamp", -1).to_list(100)
     return {"city": city, "count": len(logs), "searches": [SearchLog(**log) for log in logs]}
 
 # ==================== DOCUMENT UPLOAD ROUTES ====================
 
 @api_router.post("/documents/upload")
 async def upload_document(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload a document (CV, diplôme, attestation, etc.)"""
-    # Validate file type
-    allowed_types = ["application/pdf", "image/jpeg", "image/png", "image/jpg"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Type de fichier non autorisé. PDF, JPEG, PNG uniquement.")
-    
-    # Validate file size (max 10MB)
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 10MB)")
-    
+    """Upload a document (CV, diplôme, attestation, etc.; multipart field "file")"""
     # Create user directory
     user_dir = UPLOAD_DIR / current_user["id"]
     user_dir.mkdir(exist_ok=True)
     
+    # Type (sniffed from the content) and size (max 10MB) are checked while streaming
+    upload = await receive_file(
+        request, user_dir, 10 * 1024 * 1024, {"application/pdf", "image/jpeg", "image/png"},
+        type_error="Type de fichier non autorisé. PDF, JPEG, PNG uniquement."
+    )
+    
     # Generate unique filename
     doc_id = str(uuid.uuid4())
-    extension = file.filename.split(".")[-1] if "." in file.filename else "pdf"
-    new_filename = f"{doc_id}.{extension}"
-    file_path = user_dir / new_filename
-    
-    # Save file
-    async with aiofiles.open(file_path, "wb") as f:
-        await f.write(content)
+    new_filename = f"{doc_id}.{upload.extension}"
+    upload.move_to(user_dir / new_filename)
     
     # Save document metadata
     doc = {
         "id": doc_id,
         "user_id": current_user["id"],
         "filename": new_filename,
-        "original_filename": file.filename,
-        "file_type": file.content_type,
-        "file_size": len(content),
+        "original_filename": upload.original_filename,
+        "file_type": upload.content_type,
+        "file_size": upload.size,
+        "sha256": upload.sha256,
         "file_url": f"/api/documents/{doc_id}/download",
         "uploaded_at": datetime.now(timezone.utc).isoformat()
     }
@@ -1264,21 +1930,35 @@ async def get_user_documents(current_user: dict = Depends(get_current_user)):
     docs = await db.documents.find({"user_id": current_user["id"]}, {"_id": 0}).sort("uploaded_at", -1).to_list(50)
     return [Document(**doc) for doc in docs]
 
+# Document metadata by id, for downloads. A document deleted through another
+# worker stays cached until DOCUMENT_CACHE_TTL, but its file is gone (404).
+DOCUMENT_CACHE = TTLCache(
+    max_size=int(os.environ.get('DOCUMENT_CACHE_SIZE', 5000)),
+    ttl=float(os.environ.get('DOCUMENT_CACHE_TTL', 300))
+)
+
 @api_router.get("/documents/{doc_id}/download")
-async def download_document(doc_id: str):
-    """Download a document"""
-    doc = await db.documents.find_one({"id": doc_id}, {"_id": 0})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Document non trouvé")
+async def download_document(doc_id: str, request: Request):
+    """Download a document (conditional GET and byte ranges supported)"""
+    doc = DOCUMENT_CACHE.get(doc_id)
+    if doc is None:
+        doc = await db.documents.find_one({"id": doc_id}, {"_id": 0})
+        if not doc:
+            raise HTTPException(status_code=404, detail="Document non trouvé")
+        DOCUMENT_CACHE.set(doc_id, doc)
     
     file_path = UPLOAD_DIR / doc["user_id"] / doc["filename"]
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Fichier non trouvé")
     
-    return FileResponse(
-        path=file_path,
-        filename=doc["original_filename"],
-        media_type=doc["file_type"]
+    # Documents uploaded before digests were stored get a stat-based ETag
+    return serve_file(
+        request,
+        file_path,
+        media_type=doc["file_type"],
+        etag=f'"{doc["sha256"]}"' if doc.get("sha256") else None,
+        cache_control="private, no-cache",
+        filename=doc["original_filename"]
     )
 
 @api_router.delete("/documents/{doc_id}")
@@ -1295,6 +1975,7 @@ async def delete_document(doc_id: str, current_user: dict = Depends(get_current_
     
     # Delete from DB
     await db.documents.delete_one({"id": doc_id})
+    DOCUMENT_CACHE.pop(doc_id)
     return {"message": "Document supprimé"}
 
 # ==================== APPLICATION (CANDIDATURE) ROUTES ====================
@@ -1341,7 +2022,11 @@ async def create_application(
         "created_at": now,
         "updated_at": now
     }
-    await db.applications.insert_one(application)
+    try:
+        await db.applications.insert_one(application)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Vous avez déjà postulé à cette annonce")
+    await bump_listing_counters(app_data.listing_id, applications=1)
     
     return Application(**application)
 
@@ -1394,6 +2079,161 @@ async def update_application_status(
 
 # ==================== MESSAGING ROUTES ====================
 
+# Real-time events; REALTIME_BROKER_URL (tcp://host:port) relays them between workers
+HUB = Hub(
+    backend=backend_from_url(os.environ.get('REALTIME_BROKER_URL')),
+    queue_size=int(os.environ.get('REALTIME_QUEUE_SIZE', 100))
+)
+
+@api_router.websocket("/ws")
+async def realtime_websocket(websocket: WebSocket, token: str):
+    """Push new messages and unread counts; the JWT is passed as ?token= (browsers cannot set headers)"""
+    try:
+        user = await user_from_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    unread = await get_unread_count_value(user["id"])
+    await websocket_session(websocket, HUB, user["id"], [{"type": "unread_count", "unread_count": unread}])
+
+@api_router.get("/events")
+async def realtime_events(request: Request, token: str):
+    """Server-Sent Events fallback of /ws for clients that cannot open a WebSocket"""
+    user = await user_from_token(token)
+    unread = await get_unread_count_value(user["id"])
+    return StreamingResponse(
+        event_stream(HUB, user["id"], request, [{"type": "unread_count", "unread_count": unread}]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def conversation_pair(user_a: str, user_b: str) -> str:
+    return ":".join(sorted([user_a, user_b]))
+
+def conversation_key(user_a: str, user_b: str, listing_id: Optional[str]) -> str:
+    """Conversation id: participant pair (order independent) + listing"""
+    return f"{conversation_pair(user_a, user_b)}:{listing_id or 'general'}"
+
+async def update_conversation(message: dict):
+    """
+    Fold a new message into its conversation summary: last message, last date
+    and the receiver's unread counter, in one atomic upsert
+    """
+    sender, receiver = message["sender_id"], message["receiver_id"]
+    await db.conversations.update_one(
+        {"key": conversation_key(sender, receiver, message.get("listing_id"))},
+        {
+            "$set": {
+                "last_message": message["content"],
+                "last_message_date": message["created_at"],
+                "last_sender_id": sender,
+                f"participant_info.{sender}": {"name": message["sender_name"], "email": message["sender_email"]},
+                f"participant_info.{receiver}": {"name": message["receiver_name"], "email": message["receiver_email"]}
+            },
+            "$setOnInsert": {
+                "pair": conversation_pair(sender, receiver),
+                "participants": sorted({sender, receiver}),
+                "listing_id": message.get("listing_id"),
+                "listing_title": message.get("listing_title")
+            },
+            "$inc": {f"unread.{receiver}": 0 if message.get("read") else 1}
+        },
+        upsert=True
+    )
+
+UNREAD_RECONCILE_INTERVAL = float(os.environ.get('UNREAD_RECONCILE_INTERVAL', 3600))
+UNREAD_RECONCILE_TASK = None
+
+async def bump_unread_count(user_id: str, delta: int):
+    """Maintain the per-user unread counter served by /messages/unread-count, and push its new value"""
+    if delta:
+        counter = await db.unread_counters.find_one_and_update(
+            {"user_id": user_id},
+            {"$inc": {"unread": delta}},
+            {"_id": 0, "unread": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        await HUB.publish(user_id, {"type": "unread_count", "unread_count": max(counter["unread"], 0)})
+
+async def get_unread_count_value(user_id: str) -> int:
+    counter = await db.unread_counters.find_one({"user_id": user_id}, {"_id": 0, "unread": 1})
+    return max(counter.get("unread", 0), 0) if counter else 0
+
+async def reconcile_unread_counters(dry_run: bool = False) -> List[dict]:
+    """
+    Recount every user's unread messages and repair drifted counters
+    Returns the drift found: [{"user_id", "counter", "actual"}]
+    """
+    # Counters are read before the recount: a message sent or read in between
+    # changes the counter, so the compare-and-set below fails instead of
+    # writing a count that misses it
+    stored = {}
+    async for counter in db.unread_counters.find({}, {"_id": 0}):
+        stored[counter["user_id"]] = counter.get("unread", 0)
+    actual = {}
+    async for row in db.messages.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$receiver_id", "total": {"$sum": 1}}}
+    ]):
+        actual[row["_id"]] = row["total"]
+    
+    drift = []
+    for user_id in set(actual) | set(stored):
+        counter, value = stored.get(user_id, 0), actual.get(user_id, 0)
+        if counter == value:
+            continue
+        drift.append({"user_id": user_id, "counter": counter, "actual": value})
+        if not dry_run:
+            # Compare-and-set: a counter bumped since it was read is left to the next pass
+            if user_id in stored:
+                await db.unread_counters.update_one(
+                    {"user_id": user_id, "unread": stored[user_id]}, {"$set": {"unread": value}}
+                )
+                continue
+            try:
+                # Missing counter: only create it, never overwrite one created meanwhile
+                await db.unread_counters.update_one(
+                    {"user_id": user_id}, {"$setOnInsert": {"unread": value}}, upsert=True
+                )
+            except DuplicateKeyError:
+                pass
+    return drift
+
+async def reconcile_unread_counters_periodically():
+    # The first pass also seeds the counters of a database that predates them
+    while True:
+        try:
+            # One worker at a time, see acquire_lease
+            if await acquire_lease("unread-reconcile", UNREAD_RECONCILE_INTERVAL * 1.5):
+                drift = await reconcile_unread_counters()
+                if drift:
+                    logger.warning("Repaired %d drifted unread counter(s)", len(drift))
+        except Exception:
+            logger.exception("Unread counter reconciliation failed")
+        await asyncio.sleep(UNREAD_RECONCILE_INTERVAL)
+
+async def backfill_message_pairs() -> int:
+    """Set the participant pair on messages created before history was paginated by pair"""
+    updated = 0
+    async for message in db.messages.find(
+        {"pair": {"$exists": False}}, {"_id": 0, "id": 1, "sender_id": 1, "receiver_id": 1}
+    ):
+        await db.messages.update_one(
+            {"id": message["id"]},
+            {"$set": {"pair": conversation_pair(message["sender_id"], message["receiver_id"])}}
+        )
+        updated += 1
+    return updated
+
+async def rebuild_conversations() -> int:
+    """Rebuild every conversation summary from the messages collection"""
+    await db.conversations.delete_many({})
+    async for message in db.messages.find({}, {"_id": 0}).sort("created_at", 1):
+        await update_conversation(message)
+    return await db.conversations.count_documents({})
+
 @api_router.post("/messages", response_model=Message)
 async def send_message(msg_data: MessageCreate, current_user: dict = Depends(get_current_user)):
     """Send a message to another user"""
@@ -1404,10 +2244,12 @@ async def send_message(msg_data: MessageCreate, current_user: dict = Depends(get
     
     # Get listing info if provided
     listing_title = None
+    is_contact = False
     if msg_data.listing_id:
         listing = await db.listings.find_one({"id": msg_data.listing_id}, {"_id": 0})
         if listing:
             listing_title = listing["title"]
+            is_contact = listing["owner_id"] == msg_data.receiver_id
     
     msg_id = str(uuid.uuid4())
     message = {
@@ -1418,6 +2260,7 @@ async def send_message(msg_data: MessageCreate, current_user: dict = Depends(get
         "receiver_id": msg_data.receiver_id,
         "receiver_name": f"{receiver['first_name']} {receiver['last_name']}",
         "receiver_email": receiver["email"],
+        "pair": conversation_pair(current_user["id"], msg_data.receiver_id),
         "listing_id": msg_data.listing_id,
         "listing_title": listing_title,
         "content": msg_data.content,
@@ -1425,94 +2268,152 @@ async def send_message(msg_data: MessageCreate, current_user: dict = Depends(get
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.messages.insert_one(message)
+    await update_conversation(message)
+    if is_contact:
+        await bump_listing_counters(msg_data.listing_id, contacts=1)
+    
+    # Push to the receiver, and to the sender's other open tabs
+    event = {"type": "message", "message": Message(**message).model_dump()}
+    for user_id in {msg_data.receiver_id, current_user["id"]}:
+        await HUB.publish(user_id, event)
+    await bump_unread_count(msg_data.receiver_id, 1)
     
     return Message(**message)
 
 @api_router.get("/messages/conversations")
-async def get_conversations(current_user: dict = Depends(get_current_user)):
-    """Get all conversations for the current user"""
+async def get_conversations(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = MAX_PAGE_SIZE,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the conversations of the current user, most recent first"""
     user_id = current_user["id"]
-    
-    # Get all messages involving this user
-    messages = await db.messages.find({
-        "$or": [{"sender_id": user_id}, {"receiver_id": user_id}]
-    }, {"_id": 0}).sort("created_at", -1).to_list(500)
-    
-    # Group by conversation (other user + listing)
-    conversations = {}
-    for msg in messages:
-        other_id = msg["receiver_id"] if msg["sender_id"] == user_id else msg["sender_id"]
-        other_name = msg["receiver_name"] if msg["sender_id"] == user_id else msg["sender_name"]
-        other_email = msg["receiver_email"] if msg["sender_id"] == user_id else msg["sender_email"]
-        listing_id = msg.get("listing_id")
-        
-        conv_key = f"{other_id}_{listing_id or 'general'}"
-        
-        if conv_key not in conversations:
-            conversations[conv_key] = {
-                "other_user_id": other_id,
-                "other_user_name": other_name,
-                "other_user_email": other_email,
-                "listing_id": listing_id,
-                "listing_title": msg.get("listing_title"),
-                "last_message": msg["content"],
-                "last_message_date": msg["created_at"],
-                "unread_count": 0
-            }
-        
-        # Count unread messages
-        if msg["receiver_id"] == user_id and not msg["read"]:
-            conversations[conv_key]["unread_count"] += 1
-    
-    return [Conversation(**conv) for conv in conversations.values()]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    query = {"participants": user_id}
+    if cursor:
+        last_date, last_key = decode_cursor(cursor, "last_message_date")
+        query["$or"] = [
+            {"last_message_date": {"$lt": last_date}},
+            {"last_message_date": last_date, "key": {"$lt": last_key}}
+        ]
+    summaries = await db.conversations.find(query, {"_id": 0}).sort(
+        [("last_message_date", -1), ("key", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    if len(summaries) > limit:
+        summaries = summaries[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            "last_message_date", summaries[-1]["last_message_date"], summaries[-1]["key"]
+        )
+    
+    conversations = []
+    for summary in summaries:
+        other_id = next((p for p in summary["participants"] if p != user_id), user_id)
+        other = summary["participant_info"].get(other_id, {})
+        conversations.append(Conversation(
+            other_user_id=other_id,
+            other_user_name=other.get("name", ""),
+            other_user_email=other.get("email", ""),
+            listing_id=summary.get("listing_id"),
+            listing_title=summary.get("listing_title"),
+            last_message=summary["last_message"],
+            last_message_date=summary["last_message_date"],
+            unread_count=max(summary.get("unread", {}).get(user_id, 0), 0)
+        ))
+    return conversations
+
+MESSAGES_PAGE_SIZE = 50
 
 @api_router.get("/messages/conversation/{other_user_id}")
 async def get_conversation_messages(
+    response: Response,
     other_user_id: str,
     listing_id: Optional[str] = None,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = MESSAGES_PAGE_SIZE,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get messages in a specific conversation"""
+    """
+    Get a page of messages in a specific conversation, in chronological order
+    Without cursor: the newest page. before=: the page of older messages,
+    after=: newer messages. X-Next-Cursor continues in the same direction.
+    """
     user_id = current_user["id"]
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
     
-    query = {
-        "$or": [
-            {"sender_id": user_id, "receiver_id": other_user_id},
-            {"sender_id": other_user_id, "receiver_id": user_id}
-        ]
-    }
-    
+    query = {"pair": conversation_pair(user_id, other_user_id)}
     if listing_id:
         query["listing_id"] = listing_id
     
-    messages = await db.messages.find(query, {"_id": 0}).sort("created_at", 1).to_list(100)
-    
-    # Mark messages as read
-    await db.messages.update_many(
-        {"receiver_id": user_id, "sender_id": other_user_id, "read": False},
-        {"$set": {"read": True}}
-    )
+    newest_first = not after
+    if before or after:
+        last_created_at, last_id = decode_cursor(before or after, "message")
+        op = "$lt" if before else "$gt"
+        query["$or"] = [
+            {"created_at": {op: last_created_at}},
+            {"created_at": last_created_at, "id": {op: last_id}}
+        ]
+    direction = -1 if newest_first else 1
+    messages = await db.messages.find(query, {"_id": 0}).sort(
+        [("created_at", direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("message", messages[-1]["created_at"], messages[-1]["id"])
+    if newest_first:
+        messages.reverse()
+    
+    # Mark as read the unread messages of this page, if any
+    unread = {}
+    for msg in messages:
+        if msg["receiver_id"] == user_id and not msg.get("read"):
+            unread.setdefault(msg.get("listing_id"), []).append(msg["id"])
+    for msg_listing_id, ids in unread.items():
+        result = await db.messages.update_many(
+            {"id": {"$in": ids}, "read": False},
+            {"$set": {"read": True}}
+        )
+        if result.modified_count:
+            await db.conversations.update_one(
+                {"key": conversation_key(user_id, other_user_id, msg_listing_id)},
+                {"$inc": {f"unread.{user_id}": -result.modified_count}}
+            )
+            await bump_unread_count(user_id, -result.modified_count)
+        for msg in messages:
+            if msg["id"] in ids:
+                msg["read"] = True
     
     return [Message(**msg) for msg in messages]
 
 @api_router.get("/messages/unread-count")
 async def get_unread_count(current_user: dict = Depends(get_current_user)):
     """Get total unread message count"""
-    count = await db.messages.count_documents({
-        "receiver_id": current_user["id"],
-        "read": False
-    })
-    return {"unread_count": count}
+    return {"unread_count": await get_unread_count_value(current_user["id"])}
 
 @api_router.put("/messages/{msg_id}/read")
 async def mark_message_read(msg_id: str, current_user: dict = Depends(get_current_user)):
     """Mark a message as read"""
-    result = await db.messages.update_one(
-        {"id": msg_id, "receiver_id": current_user["id"]},
-        {"$set": {"read": True}}
+    user_id = current_user["id"]
+    message = await db.messages.find_one_and_update(
+        {"id": msg_id, "receiver_id": user_id, "read": False},
+        {"$set": {"read": True}},
+        {"_id": 0, "sender_id": 1, "listing_id": 1}
     )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Message non trouvé")
+    if message is None:
+        if not await db.messages.find_one({"id": msg_id, "receiver_id": user_id}, {"_id": 0, "id": 1}):
+            raise HTTPException(status_code=404, detail="Message non trouvé")
+        # Already read
+        return {"message": "Message marqué comme lu"}
+    
+    await db.conversations.update_one(
+        {"key": conversation_key(message["sender_id"], user_id, message.get("listing_id"))},
+        {"$inc": {f"unread.{user_id}": -1}}
+    )
+    await bump_unread_count(user_id, -1)
     return {"message": "Message marqué comme lu"}
 
 # ==================== OWNER INFO ROUTE ====================
@@ -1573,6 +2474,8 @@ async def verify_user(user_id: str, action: str, current_user: dict = Depends(ge
         }}
     )
     
+    invalidate_cached_user(user_id)
+    
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
     return updated_user
 
@@ -1596,6 +2499,40 @@ async def get_all_users(current_user: dict = Depends(get_current_user)):
     
     return {"stats": stats, "users": users}
 
+@api_router.get("/admin/view-buffer")
+async def get_view_buffer_stats(current_user: dict = Depends(get_current_user)):
+    """View tracking buffer metrics (admin only)"""
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return VIEW_BUFFER.stats()
+
+@api_router.get("/admin/realtime")
+async def get_realtime_stats(current_user: dict = Depends(get_current_user)):
+    """Real-time hub metrics of this worker (admin only)"""
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return HUB.stats()
+
+@api_router.get("/admin/uploads")
+async def get_upload_stats(current_user: dict = Depends(get_current_user)):
+    """Upload metrics of this worker (admin only)"""
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {"budget": UPLOAD_BUDGET.stats(), "photo_variants": IMAGE_PIPELINE.stats()}
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Hit/miss statistics of the in-process caches (admin only)"""
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {
+        "matches": MATCH_CACHE.stats(),
+        "facets": FACETS_CACHE.stats(),
+        "documents": DOCUMENT_CACHE.stats(),
+        "tokens": TOKEN_CACHE.stats(),
+        "users": USER_CACHE.stats()
+    }
+
 # Route to get equipment options
 @api_router.get("/equipment-options")
 async def get_equipment_options():
@@ -1610,6 +2547,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 logging.basicConfig(
@@ -1618,6 +2556,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def check_gazetteer():
+    if len(GAZETTEER) < FULL_GAZETTEER_MIN_COMMUNES:
+        logger.warning(
+            "Commune gazetteer holds only %d communes: listings in other communes get no location "
+            "and are missing from radius search. Run `python build_gazetteer.py --download`.",
+            len(GAZETTEER)
+        )
+
+@app.on_event("startup")
+async def start_view_buffer():
+    global known_listing_ids_version
+    # Version read first: a write during the scan clears the set on the next view
+    known_listing_ids_version = await get_listings_version()
+    async for listing in db.listings.find({}, {"_id": 0, "id": 1}):
+        KNOWN_LISTING_IDS.add(listing["id"])
+    VIEW_BUFFER.start()
+
+@app.on_event("startup")
+async def start_unread_reconciliation():
+    global UNREAD_RECONCILE_TASK
+    UNREAD_RECONCILE_TASK = asyncio.create_task(reconcile_unread_counters_periodically())
+
+@app.on_event("startup")
+async def start_alert_checks():
+    global ALERT_CHECK_TASK
+    ALERT_CHECK_TASK = asyncio.create_task(check_alerts_periodically())
+
+@app.on_event("startup")
+async def start_realtime_hub():
+    await HUB.start()
+
+async def backfill_listing_locations() -> int:
+    """Set the GeoJSON location on listings created before radius search used $geoNear"""
+    updated = 0
+    async for listing in db.listings.find({"location": {"$exists": False}}, {"_id": 0, "id": 1, "city": 1}):
+        location = listing_location(listing.get("city", ""))
+        if location:
+            await db.listings.update_one({"id": listing["id"]}, {"$set": {"location": location}})
+            updated += 1
+    return updated
+
+async def backfill_city_keys() -> dict:
+    """Set the normalized city_key on listings, alerts and search logs written before it existed"""
+    updated = {}
+    for collection in (db.listings, db.alerts, db.search_logs):
+        requests = []
+        async for doc in collection.find({"city_key": {"$exists": False}}, {"_id": 1, "city": 1}):
+            city = doc.get("city")
+            requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"city_key": normalize_city(city) if city else None}}))
+        if requests:
+            await collection.bulk_write(requests, ordered=False)
+        updated[collection.name] = len(requests)
+    return updated
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if UNREAD_RECONCILE_TASK is not None:
+        UNREAD_RECONCILE_TASK.cancel()
+    if ALERT_CHECK_TASK is not None:
+        ALERT_CHECK_TASK.cancel()
+    await HUB.stop()
+    await VIEW_BUFFER.stop()
+    password_hasher.shutdown()
+    IMAGE_PIPELINE.shutdown()
     client.close()
\ No newline at end of file
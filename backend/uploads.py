@@ -0,0 +1,206 @@
+"""
+Streaming multipart uploads
+
+receive_upload() parses the request body as it arrives instead of letting the
+form parser buffer the whole file first. The file part is written chunk by
+chunk to a temporary file next to its destination, while:
+- the size limit is enforced (the upload is aborted as soon as it is exceeded)
+- a SHA-256 digest is computed
+- the real content type is sniffed from the first bytes, whatever the client
+  claims
+The caller then moves the temporary file into place with an atomic rename.
+
+UploadBudget caps the bytes of all uploads in flight: past the cap, new
+uploads wait for room (backpressure) and give up after a timeout.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import aiofiles
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Magic bytes -> (content type, extension)
+SIGNATURES = [
+    (b"\xff\xd8\xff", ("image/jpeg", "jpg")),
+    (b"\x89PNG\r\n\x1a\n", ("image/png", "png")),
+    (b"%PDF-", ("application/pdf", "pdf")),
+]
+SNIFF_BYTES = 16
+# Multipart headers and boundaries on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadError(Exception):
+    """The upload is rejected; the message is the user-facing detail"""
+
+
+class UploadBudgetExhausted(Exception):
+    """Too many upload bytes are already in flight"""
+
+
+def sniff_content_type(head: bytes) -> Optional[tuple]:
+    """(content type, extension) from a file's first bytes, or None"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for signature, detected in SIGNATURES:
+        if head.startswith(signature):
+            return detected
+    return None
+
+
+@dataclass
+class ReceivedUpload:
+    temp_path: Path
+    original_filename: str
+    content_type: str
+    extension: str
+    size: int
+    sha256: str
+
+    def move_to(self, path: Path):
+        """Atomically move the upload to its final path (same filesystem)"""
+        os.replace(self.temp_path, path)
+
+    def discard(self):
+        self.temp_path.unlink(missing_ok=True)
+
+
+class UploadBudget:
+    def __init__(self, max_bytes: int, timeout: float = 10.0):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._room = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        size = min(size, self.max_bytes)
+        async with self._room:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._room.wait_for(lambda: self.in_flight + size <= self.max_bytes), self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise UploadBudgetExhausted()
+            finally:
+                self.waiting -= 1
+            self.in_flight += size
+        try:
+            yield
+        finally:
+            async with self._room:
+                self.in_flight -= size
+                self._room.notify_all()
+
+    def stats(self) -> dict:
+        return {"in_flight_bytes": self.in_flight, "max_bytes": self.max_bytes, "waiting": self.waiting}
+
+
+def _disposition(headers: Dict[bytes, bytes]) -> tuple:
+    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+    filename = options.get(b"filename")
+    return options.get(b"name", b"").decode(), filename.decode(errors="replace") if filename is not None else None
+
+
+async def receive_upload(request, directory: Path, max_size: int, allowed_types: set,
+                         field: str = "file", type_error: str = "Type de fichier non autorisé") -> ReceivedUpload:
+    """
+    Stream the `field` file part of a multipart request into a temporary file in directory
+    type_error is the UploadError message for content outside allowed_types
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadError("Requête multipart/form-data attendue")
+
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    os.close(fd)
+    temp_path = Path(temp_name)
+    state = {"headers": {}, "header_field": b"", "header_value": b"", "in_file": False, "filename": None,
+             "found": False}
+    pending = []
+
+    def on_part_begin():
+        state["headers"], state["in_file"] = {}, False
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"], state["header_value"] = b"", b""
+
+    def on_headers_finished():
+        name, filename = _disposition(state["headers"])
+        if name == field and filename is not None and not state["found"]:
+            state["in_file"], state["found"], state["filename"] = True, True, filename
+
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            pending.append(bytes(data[start:end]))
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    detected = None
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for data in pending:
+                    size += len(data)
+                    if size > max_size:
+                        raise UploadError(f"Fichier trop volumineux (max {max_size // (1024 * 1024)}MB)")
+                    if detected is None:
+                        head += data[:SNIFF_BYTES - len(head)]
+                        if len(head) >= SNIFF_BYTES:
+                            detected = sniff_content_type(head)
+                            if detected is None or detected[0] not in allowed_types:
+                                raise UploadError(type_error)
+                    digest.update(data)
+                    await out.write(data)
+                pending.clear()
+            parser.finalize()
+        if not state["found"]:
+            raise UploadError("Aucun fichier reçu")
+        if detected is None:
+            # Files shorter than SNIFF_BYTES
+            detected = sniff_content_type(head)
+            if detected is None or detected[0] not in allowed_types:
+                raise UploadError(type_error)
+    except MultipartParseError:
+        temp_path.unlink(missing_ok=True)
+        raise UploadError("Requête multipart invalide")
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    return ReceivedUpload(
+        temp_path=temp_path,
+        original_filename=state["filename"],
+        content_type=detected[0],
+        extension=detected[1],
+        size=size,
+        sha256=digest.hexdigest()
+    )
@@ -0,0 +1,83 @@
+"""
+Write-behind buffer for listing view events
+
+Views are accepted in memory and written in batches by a background task,
+either when flush_size events are waiting or every flush_interval seconds.
+The buffer is bounded: once max_size events are waiting, new events are
+dropped (views are best-effort analytics) and counted in the metrics.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class ViewBuffer:
+    def __init__(
+        self,
+        flush: Callable[[List[dict]], Awaitable[None]],
+        max_size: int = 10000,
+        flush_size: int = 500,
+        flush_interval: float = 2.0
+    ):
+        self._flush = flush
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._events: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self.metrics = {"buffered": 0, "flushed": 0, "dropped": 0, "failed": 0}
+
+    def add(self, event: dict) -> bool:
+        """Queue an event; returns False when it was dropped because the buffer is full"""
+        if len(self._events) >= self.max_size:
+            self.metrics["dropped"] += 1
+            self._wakeup.set()
+            return False
+        self._events.append(event)
+        self.metrics["buffered"] += 1
+        if len(self._events) >= self.flush_size:
+            self._wakeup.set()
+        return True
+
+    def stats(self) -> dict:
+        return {**self.metrics, "pending": len(self._events), "max_size": self.max_size}
+
+    async def flush(self):
+        """Write every pending event now"""
+        if not self._events:
+            return
+        batch, self._events = self._events, []
+        try:
+            await self._flush(batch)
+            self.metrics["flushed"] += len(batch)
+        except Exception:
+            self.metrics["failed"] += len(batch)
+            logger.exception("Failed to flush %d listing view(s)", len(batch))
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush what is left"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
@@ -10,6 +10,7 @@ import {
   DropdownMenuTrigger,
   DropdownMenuSeparator,
 } from './ui/dropdown-menu';
+import { isRealtimeConnected, subscribeRealtime } from '../lib/realtime';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -30,8 +31,17 @@ export const Header = ({ user, onLogout }) => {
   useEffect(() => {
     if (user) {
       fetchUnreadCount();
-      const interval = setInterval(fetchUnreadCount, 30000);
-      return () => clearInterval(interval);
+      const unsubscribe = subscribeRealtime((event) => {
+        if (event.type === 'unread_count') setUnreadCount(event.unread_count);
+      });
+      // Poll only while the real-time connection is down
+      const interval = setInterval(() => {
+        if (!isRealtimeConnected()) fetchUnreadCount();
+      }, 30000);
+      return () => {
+        clearInterval(interval);
+        unsubscribe();
+      };
     }
   }, [user]);
 
@@ -1,10 +1,11 @@
 import React from 'react';
 import { Link } from 'react-router-dom';
 import { MapPin, Users, TrendingUp, Home, Sparkles, ArrowUpRight } from 'lucide-react';
+import { photoVariant } from '../lib/utils';
 
 export const ListingCard = ({ listing, matchScore, matchReasons }) => {
   const mainImage = listing.photos && listing.photos.length > 0 
-    ? listing.photos[0] 
+    ? photoVariant(listing.photos[0], 'card') 
     : 'https://images.unsplash.com/photo-1497366216548-37526070297c?w=800';
 
   return (
@@ -3,6 +3,7 @@ import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
 import L from 'leaflet';
 import { Link } from 'react-router-dom';
 import ReactDOMServer from 'react-dom/server';
+import { photoVariant } from '../lib/utils';
 
 // Fix for default marker icon
 delete L.Icon.Default.prototype._getIconUrl;
@@ -15,7 +16,7 @@ L.Icon.Default.mergeOptions({
 // Rich marker component
 const MarkerCard = ({ listing }) => {
   const imageUrl = listing.photos && listing.photos[0] 
-    ? listing.photos[0] 
+    ? photoVariant(listing.photos[0], 'thumb') 
     : 'https://images.unsplash.com/photo-1497366216548-37526070297c?w=400';
 
   return (
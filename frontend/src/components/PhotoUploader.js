@@ -3,6 +3,7 @@ import axios from 'axios';
 import { Button } from './ui/button';
 import { Upload, X, Image, Loader2 } from 'lucide-react';
 import { toast } from 'sonner';
+import { photoVariant } from '../lib/utils';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -145,7 +146,7 @@ export function PhotoUploader({ photos, onPhotosChange, maxPhotos = 5 }) {
               style={{ backgroundColor: '#E8E0D5' }}
             >
               <img 
-                src={photo} 
+                src={photoVariant(photo, 'thumb')} 
                 alt={`Photo ${index + 1}`}
                 className="w-full h-full object-cover"
                 onError={(e) => {
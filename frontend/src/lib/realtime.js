@@ -0,0 +1,81 @@
+// Shared real-time connection: one WebSocket per tab (SSE when WebSockets fail),
+// reconnecting with backoff. Listeners receive {type: 'message' | 'unread_count', ...}.
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+
+const listeners = new Set();
+let source = null;
+let connected = false;
+let retryDelay = 1000;
+let retryTimer = null;
+let websocketFailures = 0;
+
+const dispatch = (event) => listeners.forEach((listener) => listener(event));
+
+const scheduleReconnect = () => {
+  connected = false;
+  source = null;
+  if (listeners.size === 0 || retryTimer) return;
+  retryTimer = setTimeout(() => {
+    retryTimer = null;
+    connect();
+  }, retryDelay);
+  retryDelay = Math.min(retryDelay * 2, 30000);
+};
+
+const onOpen = () => {
+  connected = true;
+  retryDelay = 1000;
+};
+
+const connect = () => {
+  const token = localStorage.getItem('cablib_token');
+  if (!token || source) return;
+
+  if (websocketFailures < 2 && 'WebSocket' in window) {
+    const socket = new WebSocket(`${BACKEND_URL.replace(/^http/, 'ws')}/api/ws?token=${encodeURIComponent(token)}`);
+    socket.onopen = () => {
+      websocketFailures = 0;
+      onOpen();
+    };
+    socket.onmessage = (e) => dispatch(JSON.parse(e.data));
+    socket.onclose = () => {
+      if (!connected) websocketFailures += 1;
+      scheduleReconnect();
+    };
+    source = socket;
+  } else {
+    const events = new EventSource(`${BACKEND_URL}/api/events?token=${encodeURIComponent(token)}`);
+    events.onopen = onOpen;
+    ['message', 'unread_count'].forEach((type) =>
+      events.addEventListener(type, (e) => dispatch(JSON.parse(e.data)))
+    );
+    events.onerror = () => {
+      events.close();
+      scheduleReconnect();
+    };
+    source = events;
+  }
+};
+
+export const subscribeRealtime = (listener) => {
+  listeners.add(listener);
+  connect();
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && retryTimer) {
+      clearTimeout(retryTimer);
+      retryTimer = null;
+    }
+    if (listeners.size === 0 && source) {
+      const current = source;
+      source = null;
+      connected = false;
+      current.onclose = null;
+      current.onerror = null;
+      current.close();
+    }
+  };
+};
+
+// Polling fallback: components keep polling only while this is false
+export const isRealtimeConnected = () => connected;
@@ -4,3 +4,9 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Resized variant ('thumb', 'card' or 'full') of an uploaded listing photo;
+// other URLs are returned unchanged
+export function photoVariant(url, size) {
+  return url && url.includes('/api/listing-photos/') ? `${url}?size=${size}` : url;
+}
@@ -133,6 +133,11 @@ export default function AlertsPage({ user, onLogout }) {
                         >
                           {alert.active ? 'Active' : 'Inactive'}
                         </span>
+                        {alert.new_count > 0 && (
+                          <span className="px-3 py-1 rounded-full text-xs font-medium bg-primary text-white">
+                            {alert.new_count} {alert.new_count > 1 ? 'nouvelles annonces' : 'nouvelle annonce'}
+                          </span>
+                        )}
                       </div>
                       <p className="text-sm text-muted-foreground">
                         Créée le {new Date(alert.created_at).toLocaleDateString('fr-FR')}
@@ -7,6 +7,7 @@ import { ScheduleVisitModal } from '../components/ScheduleVisitModal';
 import { ApplicationModal } from '../components/ApplicationModal';
 import { MessageTemplates } from '../components/MessageTemplates';
 import { Button } from '../components/ui/button';
+import { photoVariant } from '../lib/utils';
 import { MapPin, Home, Users, TrendingUp, Mail, Heart, ArrowLeft, Building2, Calculator, Calendar, FileText, MessageCircle, X } from 'lucide-react';
 import { toast } from 'sonner';
 import { Loader2 } from 'lucide-react';
@@ -209,7 +210,7 @@ export default function ListingDetail({ user, onLogout }) {
           <div className="mb-8" data-testid="image-gallery">
             <div className="relative h-96 rounded-2xl overflow-hidden mb-4">
               <img 
-                src={images[selectedImageIndex]} 
+                src={photoVariant(images[selectedImageIndex], 'full')} 
                 alt={listing.title}
                 className="w-full h-full object-cover"
                 data-testid="main-image"
@@ -231,7 +232,7 @@ export default function ListingDetail({ user, onLogout }) {
                     }`}
                     data-testid={`thumbnail-${idx}`}
                   >
-                    <img src={img} alt="" className="w-full h-full object-cover" />
+                    <img src={photoVariant(img, 'thumb')} alt="" className="w-full h-full object-cover" />
                   </button>
                 ))}
               </div>
@@ -9,10 +9,20 @@ import {
   MessageSquare
 } from 'lucide-react';
 import { toast } from 'sonner';
+import { isRealtimeConnected, subscribeRealtime } from '../lib/realtime';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Newest page of a conversation, or the page before the `before` cursor
+const conversationUrl = (conv, before) => {
+  const params = new URLSearchParams();
+  if (conv.listing_id) params.set('listing_id', conv.listing_id);
+  if (before) params.set('before', before);
+  const query = params.toString();
+  return `${API}/messages/conversation/${conv.other_user_id}${query ? `?${query}` : ''}`;
+};
+
 export default function MessagesPage({ user, onLogout }) {
   const navigate = useNavigate();
   const [searchParams] = useSearchParams();
@@ -24,7 +34,12 @@ export default function MessagesPage({ user, onLogout }) {
   const [loadingMessages, setLoadingMessages] = useState(false);
   const [sending, setSending] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const messagesEndRef = useRef(null);
+  // Conversation whose older pages were loaded: refreshes then keep them
+  const olderLoadedFor = useRef(null);
+  const keepScroll = useRef(false);
 
   // Get recipient from URL params (for direct contact)
   const recipientId = searchParams.get('to');
@@ -101,20 +116,24 @@ export default function MessagesPage({ user, onLogout }) {
   const fetchMessages = useCallback(async (conv) => {
     if (!conv || conv.isNew) {
       setMessages([]);
+      setOlderCursor(null);
       return;
     }
 
     setLoadingMessages(true);
     try {
       const token = localStorage.getItem('cablib_token');
-      const url = conv.listing_id 
-        ? `${API}/messages/conversation/${conv.other_user_id}?listing_id=${conv.listing_id}`
-        : `${API}/messages/conversation/${conv.other_user_id}`;
-      
-      const response = await axios.get(url, {
+      const response = await axios.get(conversationUrl(conv), {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setMessages(response.data);
+      const page = response.data;
+      if (olderLoadedFor.current === conv && page.length > 0) {
+        setMessages(prev => [...prev.filter(m => m.created_at < page[0].created_at), ...page]);
+      } else {
+        olderLoadedFor.current = null;
+        setMessages(page);
+        setOlderCursor(response.headers['x-next-cursor'] || null);
+      }
       
       // Refresh conversations to update unread count
       fetchConversations();
@@ -132,19 +151,60 @@ export default function MessagesPage({ user, onLogout }) {
   }, [selectedConversation, fetchMessages]);
 
   useEffect(() => {
+    if (keepScroll.current) {
+      keepScroll.current = false;
+      return;
+    }
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
-  // Poll for new messages every 10 seconds
+  const loadOlderMessages = async () => {
+    if (!olderCursor || !selectedConversation) return;
+    setLoadingOlder(true);
+    try {
+      const token = localStorage.getItem('cablib_token');
+      const response = await axios.get(conversationUrl(selectedConversation, olderCursor), {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      olderLoadedFor.current = selectedConversation;
+      keepScroll.current = true;
+      setMessages(prev => [...response.data, ...prev]);
+      setOlderCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      toast.error('Erreur lors du chargement des messages');
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
+  // New messages are pushed; poll every 10 seconds only while the push connection is down
   useEffect(() => {
-    if (!selectedConversation) return;
+    if (!user) return;
+    
+    const unsubscribe = subscribeRealtime((event) => {
+      if (event.type !== 'message') return;
+      const msg = event.message;
+      const conv = selectedConversation;
+      const otherUserId = msg.sender_id === user.id ? msg.receiver_id : msg.sender_id;
+      if (conv && !conv.isNew && conv.other_user_id === otherUserId &&
+          (conv.listing_id || null) === (msg.listing_id || null)) {
+        fetchMessages(conv);
+      } else {
+        fetchConversations();
+      }
+    });
     
     const interval = setInterval(() => {
-      fetchMessages(selectedConversation);
+      if (selectedConversation && !isRealtimeConnected()) {
+        fetchMessages(selectedConversation);
+      }
     }, 10000);
     
-    return () => clearInterval(interval);
-  }, [selectedConversation, fetchMessages]);
+    return () => {
+      clearInterval(interval);
+      unsubscribe();
+    };
+  }, [user, selectedConversation, fetchMessages, fetchConversations]);
 
   const handleSendMessage = async (e) => {
     e.preventDefault();
@@ -336,7 +396,16 @@ export default function MessagesPage({ user, onLogout }) {
                     </p>
                   </div>
                 ) : (
-                  messages.map((msg) => (
+                  <>
+                  {olderCursor && (
+                    <div className="flex justify-center">
+                      <Button variant="ghost" size="sm" onClick={loadOlderMessages} disabled={loadingOlder}>
+                        {loadingOlder && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                        Messages précédents
+                      </Button>
+                    </div>
+                  )}
+                  {messages.map((msg) => (
                     <div
                       key={msg.id}
                       className={`flex ${msg.sender_id === user.id ? 'justify-end' : 'justify-start'}`}
@@ -361,7 +430,8 @@ export default function MessagesPage({ user, onLogout }) {
                         </div>
                       </div>
                     </div>
-                  ))
+                  ))}
+                  </>
                 )}
                 <div ref={messagesEndRef} />
               </div>
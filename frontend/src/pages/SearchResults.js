@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useSearchParams } from 'react-router-dom';
 import axios from 'axios';
 import { Header } from '../components/Header';
@@ -18,6 +18,10 @@ export default function SearchResults({ user, onLogout }) {
   const [searchParams] = useSearchParams();
   const [listings, setListings] = useState([]);
   const [loading, setLoading] = useState(true);
+  // Keyset pagination: X-Next-Cursor of the last page loaded, null when there is no more
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const searchId = useRef(0);
   const [showFilters, setShowFilters] = useState(false);
   const [showAlertModal, setShowAlertModal] = useState(false);
   const [filters, setFilters] = useState({
@@ -45,23 +49,29 @@ export default function SearchResults({ user, onLogout }) {
     fetchListings();
   }, [filters]);
 
+  const searchParamsFor = () => {
+    const params = {};
+    if (filters.city) params.city = filters.city;
+    if (filters.radius) params.radius = parseInt(filters.radius);
+    if (filters.structure_type) params.structure_type = filters.structure_type;
+    if (filters.min_size) params.min_size = filters.min_size;
+    if (filters.max_rent) params.max_rent = filters.max_rent;
+    if (filters.profession) params.profession = filters.profession;
+    // New filters
+    if (filters.has_parking === 'true') params.has_parking = true;
+    if (filters.is_pmr_accessible === 'true') params.is_pmr_accessible = true;
+    if (filters.equipments) params.equipments = filters.equipments;
+    return params;
+  };
+
   const fetchListings = async () => {
+    const currentSearch = ++searchId.current;
     setLoading(true);
     try {
-      const params = {};
-      if (filters.city) params.city = filters.city;
-      if (filters.radius) params.radius = parseInt(filters.radius);
-      if (filters.structure_type) params.structure_type = filters.structure_type;
-      if (filters.min_size) params.min_size = filters.min_size;
-      if (filters.max_rent) params.max_rent = filters.max_rent;
-      if (filters.profession) params.profession = filters.profession;
-      // New filters
-      if (filters.has_parking === 'true') params.has_parking = true;
-      if (filters.is_pmr_accessible === 'true') params.is_pmr_accessible = true;
-      if (filters.equipments) params.equipments = filters.equipments;
-
-      const response = await axios.get(`${API}/listings`, { params });
+      const response = await axios.get(`${API}/listings`, { params: searchParamsFor() });
+      if (currentSearch !== searchId.current) return;
       setListings(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
 
       // Log search if user is authenticated
       if (user) {
@@ -84,7 +94,26 @@ export default function SearchResults({ user, onLogout }) {
     } catch (error) {
       toast.error('Erreur lors du chargement des annonces');
     } finally {
-      setLoading(false);
+      if (currentSearch === searchId.current) setLoading(false);
+    }
+  };
+
+  const loadMoreListings = async () => {
+    if (!nextCursor) return;
+    const currentSearch = searchId.current;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/listings`, {
+        params: { ...searchParamsFor(), cursor: nextCursor }
+      });
+      // Filters changed meanwhile: this page belongs to the previous search
+      if (currentSearch !== searchId.current) return;
+      setListings(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      toast.error('Erreur lors du chargement des annonces');
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -124,7 +153,7 @@ export default function SearchResults({ user, onLogout }) {
             )}
             
             <div className="text-sm text-muted-foreground">
-              {loading ? 'Chargement...' : `${listings.length} annonce${listings.length > 1 ? 's' : ''} trouvée${listings.length > 1 ? 's' : ''}`}
+              {loading ? 'Chargement...' : `${listings.length}${nextCursor ? '+' : ''} annonce${listings.length > 1 ? 's' : ''} trouvée${listings.length > 1 ? 's' : ''}`}
             </div>
           </div>
         </div>
@@ -178,6 +207,20 @@ export default function SearchResults({ user, onLogout }) {
                     ))}
                   </div>
                 )}
+                {nextCursor && (
+                  <div className="flex justify-center mt-8">
+                    <Button
+                      variant="outline"
+                      onClick={loadMoreListings}
+                      disabled={loadingMore}
+                      className="rounded-full"
+                      data-testid="load-more-listings"
+                    >
+                      {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                      Afficher plus d'annonces
+                    </Button>
+                  </div>
+                )}
               </div>
             </>
           )}
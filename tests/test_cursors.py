@@ -0,0 +1,51 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+
+
+def raw_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager: startup hooks (MongoDB indexes, background tasks) do not run
+    return TestClient(server.app)
+
+
+def test_round_trip():
+    cursor = server.encode_cursor("distance", 1234.5, "listing-id")
+    assert server.decode_cursor(cursor, "distance", (server.NUMBER, str)) == [1234.5, "listing-id"]
+
+
+@pytest.mark.parametrize("values", [
+    ("created_at",),
+    ("created_at", "2026-01-01"),
+    ("created_at", {"$ne": None}, "x"),
+    ("created_at", True, "x"),
+    ("created_at", 3, "x"),
+])
+def test_malformed_cursor_is_rejected(values):
+    with pytest.raises(HTTPException) as error:
+        server.decode_cursor(raw_cursor(*values), "created_at")
+    assert error.value.status_code == 400
+
+
+def test_malformed_distance_cursor_returns_400(client):
+    response = client.get(
+        "/api/listings", params={"city": "Paris", "radius": 20, "cursor": raw_cursor("distance", "abc", "x")}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_cursor_of_another_search_returns_400(client):
+    response = client.get(
+        "/api/listings", params={"city": "Paris", "radius": 20, "cursor": server.encode_cursor("created_at", "a", "b")}
+    )
+    assert response.status_code == 400
@@ -0,0 +1,57 @@
+from build_gazetteer import read_communes
+from gazetteer import Gazetteer, write_gazetteer
+
+# data.gouv.fr communes-departement-region.csv layout: one row per postal code,
+# Paris / Lyon / Marseille split by arrondissement
+DATA_GOUV_ROWS = """code_commune_INSEE,nom_commune_complet,code_postal,latitude,longitude
+75101,Paris 01,75001,48.8626,2.3363
+75115,Paris 15,75015,48.8401,2.2935
+75116,Paris 16,75016,48.8604,2.2620
+75116,Paris 16,75116,48.8604,2.2620
+69383,Lyon 3e Arrondissement,69003,45.7597,4.8677
+13201,Marseille 1er Arrondissement,13001,43.2999,5.3841
+69266,Villeurbanne,69100,45.7719,4.8902
+"""
+
+# La Poste "Base officielle des codes postaux" layout
+LA_POSTE_ROWS = """#Code_commune_INSEE;Nom_de_la_commune;Code_postal;Libellé_d_acheminement;Ligne_5;coordonnees_gps
+75101;PARIS 01;75001;PARIS;;48.8626,2.3363
+75120;PARIS 20;75020;PARIS;;48.8634,2.4011
+69266;VILLEURBANNE;69100;VILLEURBANNE;;45.7719,4.8902
+"""
+
+
+def build(tmp_path, rows):
+    source = tmp_path / "communes.csv"
+    source.write_text(rows, encoding="utf-8")
+    write_gazetteer(tmp_path / "communes.bin", read_communes(source))
+    return Gazetteer(tmp_path / "communes.bin")
+
+
+def test_arrondissements_fold_into_their_commune(tmp_path):
+    gazetteer = build(tmp_path, DATA_GOUV_ROWS)
+    assert len(gazetteer) == 4
+
+    paris = gazetteer.lookup("Paris")
+    assert paris is not None and gazetteer.name(paris) == "Paris"
+    for query in ("75001", "75015", "75116", "Paris 15e", "paris 16"):
+        assert gazetteer.lookup(query) == paris
+    lat, lon = gazetteer.coordinates(paris)
+    # Mean of the three arrondissements, not one of them
+    assert abs(lat - (48.8626 + 48.8401 + 48.8604) / 3) < 1e-4
+    assert abs(lon - (2.3363 + 2.2935 + 2.2620) / 3) < 1e-4
+
+    lyon = gazetteer.lookup("Lyon")
+    assert lyon is not None and gazetteer.lookup("69003") == lyon
+    assert gazetteer.lookup("Lyon 3e") == lyon
+    assert gazetteer.lookup("Marseille") == gazetteer.lookup("13001")
+    assert gazetteer.lookup("Villeurbanne") not in (None, lyon)
+
+
+def test_la_poste_export(tmp_path):
+    gazetteer = build(tmp_path, LA_POSTE_ROWS)
+    assert len(gazetteer) == 2
+    paris = gazetteer.lookup("Paris")
+    assert gazetteer.name(paris) == "Paris"
+    assert gazetteer.lookup("75020") == paris
+    assert gazetteer.lookup("Villeurbanne") is not None